@@ -0,0 +1,78 @@
+"""
+Compare the sync read API under WSGI with its async twin under ASGI.
+
+Start both servers against the same database and Redis, with the same
+number of workers, e.g.:
+
+    gunicorn -w 4 -k gthread --threads 8 -b 127.0.0.1:8001 config.wsgi:application
+    gunicorn -c config/gunicorn.conf.py -w 4 -b 127.0.0.1:8002 config.asgi:application
+
+then run:
+
+    python benchmarks/asgi_vs_wsgi.py --wsgi-url http://127.0.0.1:8001 \\
+        --asgi-url http://127.0.0.1:8002 --concurrency 500 --duration 30
+
+Every scenario hits the sync path on the WSGI server and the ``/api/async``
+path on the ASGI server. Clients are asyncio keep-alive connections, so the
+load generator itself does not need a thread per connection. ``--uncached``
+adds a unique query parameter to listing requests so they miss the listing
+cache and reach Postgres.
+"""
+
+import argparse
+import asyncio
+import json
+
+from loadgen import get, run, unique
+
+SCENARIOS = {
+    "blogs": ("/api/blogs/?page=1", "/api/async/blogs/?page=1"),
+    "blogs_search": ("/api/blogs/?q=python", "/api/async/blogs/?q=python"),
+    "comments": ("/api/comments/?blog={blog}", "/api/async/comments/?blog={blog}"),
+    "categories": ("/api/categories/", "/api/async/categories/"),
+    "tags": ("/api/tags/", "/api/async/tags/"),
+    "menus": ("/api/menus/", "/api/async/menus/"),
+}
+LISTINGS = {"blogs", "blogs_search"}
+
+
+def cache_busting(path):
+    return lambda: (f"{path}&_={next(unique)}", "GET", None, None)
+
+
+async def main(args):
+    results = {}
+    for name in args.scenarios:
+        sync_path, async_path = (path.format(blog=args.blog) for path in SCENARIOS[name])
+        uncached = args.uncached and name in LISTINGS
+        results[name] = {}
+        for server, base_url, path in (("wsgi", args.wsgi_url, sync_path), ("asgi", args.asgi_url, async_path)):
+            make_request = cache_busting(path) if uncached else get(path)
+            if args.warmup:
+                await run(base_url, make_request, min(args.concurrency, 10), args.warmup)
+            results[name][server] = await run(base_url, make_request, args.concurrency, args.duration)
+            report(name, server, results[name][server])
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump({"concurrency": args.concurrency, "duration": args.duration, "results": results}, out, indent=2)
+
+
+def report(name, server, result):
+    print(
+        f"{name:<14} {server:<5} {result['rps']:>9.1f} req/s  p50 {result['p50_ms']:>8.1f} ms  "
+        f"p99 {result['p99_ms']:>8.1f} ms  errors {result['errors']}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--wsgi-url", required=True)
+    parser.add_argument("--asgi-url", required=True)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per scenario and server")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Warm-up seconds before each measurement")
+    parser.add_argument("--blog", type=int, default=1, help="Blog id used by the comments scenario")
+    parser.add_argument("--uncached", action="store_true", help="Bypass the listing cache")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--json", help="Also write the results to this file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,121 @@
+"""
+Minimal asyncio HTTP/1.1 load generator shared by the benchmark scripts.
+
+Stdlib only. Each simulated client holds one keep-alive connection, so a
+few hundred concurrent clients cost one event loop, not one thread each.
+"""
+
+import asyncio
+import itertools
+import statistics
+import time
+from urllib.parse import urlsplit
+
+unique = itertools.count()
+
+
+class Connection:
+    """One HTTP/1.1 keep-alive connection; reconnects when the server closes it."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, path, method="GET", body=None, headers=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}", "Accept: application/json"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        if body is not None:
+            lines += ["Content-Type: application/json", f"Content-Length: {len(body)}"]
+        self.writer.write("\r\n".join(lines).encode() + b"\r\n\r\n" + (body or b""))
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip().lower()
+
+        if "content-length" in response_headers:
+            await self.reader.readexactly(int(response_headers["content-length"]))
+        elif response_headers.get("transfer-encoding") == "chunked":
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif status not in (204, 304):
+            await self.reader.read()
+            response_headers["connection"] = "close"
+
+        if response_headers.get("connection") == "close":
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def worker(base_url, make_request, deadline, latencies, errors):
+    url = urlsplit(base_url)
+    connection = Connection(url.hostname, url.port or 80)
+    while time.monotonic() < deadline:
+        path, method, body, headers = make_request()
+        started = time.perf_counter()
+        try:
+            status = await connection.request(path, method, body, headers)
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+            connection.close()
+            errors.append(None)
+            continue
+        if status >= 400:
+            errors.append(status)
+        else:
+            latencies.append(time.perf_counter() - started)
+    connection.close()
+
+
+async def run(base_url, make_request, concurrency, duration):
+    """
+    Drive ``concurrency`` clients against ``base_url`` for ``duration`` seconds.
+
+    ``make_request()`` returns ``(path, method, body, headers)`` for each call.
+    """
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    started = time.monotonic()
+    await asyncio.gather(*(
+        worker(base_url, make_request, deadline, latencies, errors) for _ in range(concurrency)
+    ))
+    return summarize(latencies, time.monotonic() - started, errors=len(errors))
+
+
+def get(path):
+    """``make_request`` for a fixed GET."""
+    return lambda: (path, "GET", None, None)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(latencies, elapsed, errors=0):
+    """Throughput and latency percentiles (ms) for a list of per-request seconds."""
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+    }
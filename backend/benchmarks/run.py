@@ -0,0 +1,289 @@
+"""
+API benchmark suite: micro-benchmarks through the Django test client and
+optional HTTP load scenarios against a running server.
+
+Run from ``backend/``:
+
+    python benchmarks/run.py                                # micro-benchmarks
+    python benchmarks/run.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run.py --compare benchmarks/baseline.json
+    python benchmarks/run.py --url http://127.0.0.1:8000 --skip-micro
+
+Micro-benchmarks seed a throwaway ``test_<db>`` Postgres database with the
+``seed`` command (kept between runs with ``--keepdb``) and report latency percentiles, throughput
+and SQL queries per request. Cache keys get a separate prefix, so the
+suite never reads or poisons the entries of a dev server sharing Redis.
+Mongo is not needed: API requests only write outbox rows.
+
+HTTP scenarios run against whatever database the target server uses.
+They log in as ``--username`` for the authenticated writes, which create
+real comments.
+
+``--compare`` exits with status 1 when a scenario got slower than
+``--tolerance`` or issues more queries than the baseline.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+import loadgen  # noqa: E402
+
+# Listing scenarios bust the listing cache unless named "*_cached"
+bust = itertools.count()
+
+WRITER = "bench_writer"
+
+
+def micro_scenarios(ids, token):
+    auth = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+    write = dict(content_type="application/json", **auth)
+    return {
+        "blogs_cached": lambda c: c.get("/api/blogs/", {"page": 2}),
+        "blogs": lambda c: c.get("/api/blogs/", {"page": 2, "_": next(bust)}),
+        "blogs_search": lambda c: c.get("/api/blogs/", {"q": "postgres cache", "_": next(bust)}),
+        "blogs_category_tree": lambda c: c.get(
+            "/api/blogs/", {"category": ids["root_category"], "include_descendants": "true", "_": next(bust)}
+        ),
+        "blogs_feed": lambda c: c.get("/api/blogs/feed", {"page_size": 20, "_": next(bust)}),
+        "comments": lambda c: c.get("/api/comments/", {"blog": ids["busy_blog"]}),
+        "comment_tree": lambda c: c.get("/api/comments/tree", {"blog": ids["busy_blog"]}),
+        "categories": lambda c: c.get("/api/categories/"),
+        "tags": lambda c: c.get("/api/tags/"),
+        "menus": lambda c: c.get("/api/menus/"),
+        "create_comment": lambda c: c.post("/api/comments/", json.dumps(
+            {"blog_id": ids["busy_blog"], "content": "Benchmark comment", "parent_id": 0}
+        ), **write),
+        "update_blog": lambda c: c.put(f"/api/blogs/{ids['writer_blog']}", json.dumps(
+            {"title": "Benchmark edit", "description": "<p>edited</p>", "category_id": ids["root_category"],
+             "tag_ids": ids["tags"], "is_active": True}
+        ), **write),
+    }
+
+
+def benchmark_ids():
+    from django.db.models import Count
+
+    from core.models import Blog, Category, Tag, User
+
+    writer = User.objects.get_or_create(username=WRITER, defaults={"is_active": True})[0]
+    writer_blog = Blog.objects.filter(author=writer).first() or Blog.objects.create(
+        title="Writer blog", description="<p>writer</p>", author=writer
+    )
+    return {
+        "busy_blog": Blog.objects.annotate(n=Count("comment")).order_by("-n").values_list("id", flat=True).first(),
+        "root_category": Category.objects.filter(parent=None).annotate(
+            n=Count("children")).order_by("-n").values_list("id", flat=True).first(),
+        "tags": list(Tag.objects.values_list("id", flat=True)[:3]),
+        "writer_blog": writer_blog.id,
+        "writer": writer,
+    }
+
+
+def run_micro(args):
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext, setup_test_environment
+    from django.core.management import call_command
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from core.models import Blog
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, keepdb=args.keepdb)
+    try:
+        if not Blog.objects.exists():
+            call_command(
+                "seed", users=args.users, blogs=args.blogs, comments=args.blogs * args.comments,
+                categories=40, tags=60, menus=10, seed=args.seed, copy=True,
+            )
+
+        ids = benchmark_ids()
+        token = str(RefreshToken.for_user(ids["writer"]).access_token)
+        client = Client()
+        results = {}
+        for name, call in micro_scenarios(ids, token).items():
+            if args.scenarios and name not in args.scenarios:
+                continue
+            results[name] = measure(client, call, args.iterations, args.warmup_iterations, CaptureQueriesContext, connection)
+            report(name, results[name])
+        return results
+    finally:
+        if not args.keepdb:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def measure(client, call, iterations, warmup, capture, connection):
+    for _ in range(warmup):
+        check(call(client))
+
+    # Count queries on a separate pass: capturing SQL would skew the timings
+    with capture(connection) as queries:
+        check(call(client))
+    query_count = len(queries)
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        check(call(client))
+        latencies.append(time.perf_counter() - t0)
+    result = loadgen.summarize(latencies, time.perf_counter() - started)
+    result["queries"] = query_count
+    return result
+
+
+def check(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.status_code}: {response.content[:200]!r}")
+
+
+async def run_http(args):
+    base = args.url.rstrip("/")
+    token = await login(base, args.username, args.password)
+    blogs = await fetch_json(base, "/api/blogs/?page=1")
+    categories = await fetch_json(base, "/api/categories/")
+    if not blogs["items"]:
+        raise SystemExit("The target server has no blogs; seed it first")
+    blog_id = blogs["items"][0]["id"]
+    category_id = categories[0]["id"] if categories else 0
+
+    auth = {"Authorization": f"Bearer {token}"} if token else None
+    comment = json.dumps({"blog_id": blog_id, "content": "Load test comment", "parent_id": 0}).encode()
+    scenarios = {
+        "http_blogs": loadgen.get("/api/blogs/?page=1"),
+        "http_blogs_uncached": lambda: (f"/api/blogs/?page=1&_={next(bust)}", "GET", None, None),
+        "http_blogs_search": lambda: (f"/api/blogs/?q=postgres&category={category_id}&include_descendants=true"
+                                      f"&_={next(bust)}", "GET", None, None),
+        "http_comment_tree": loadgen.get(f"/api/comments/tree?blog={blog_id}"),
+        "http_comments": loadgen.get(f"/api/comments/?blog={blog_id}"),
+    }
+    if auth:
+        scenarios["http_create_comment"] = lambda: ("/api/comments/", "POST", comment, auth)
+
+    results = {}
+    for name, make_request in scenarios.items():
+        if args.warmup:
+            await loadgen.run(base, make_request, min(args.concurrency, 10), args.warmup)
+        results[name] = await loadgen.run(base, make_request, args.concurrency, args.duration)
+        report(name, results[name])
+    return results
+
+
+async def fetch_json(base, path, method="GET", body=None):
+    import urllib.request
+
+    request = urllib.request.Request(base + path, data=body, method=method,
+                                     headers={"Content-Type": "application/json"})
+    response = await asyncio.to_thread(urllib.request.urlopen, request)
+    return json.loads(response.read())
+
+
+async def login(base, username, password):
+    if not username:
+        return None
+    from urllib.parse import urlencode
+
+    data = await fetch_json(base, "/api/auth/login?" + urlencode({"username": username, "password": password}),
+                            method="POST", body=b"")
+    if "access" not in data:
+        raise SystemExit(f"Login failed: {data}")
+    return data["access"]
+
+
+def report(name, result):
+    queries = f"  queries {result['queries']:>3}" if "queries" in result else ""
+    print(
+        f"{name:<22} {result['rps']:>9.1f} req/s  p50 {result['p50_ms']:>8.2f}  p95 {result['p95_ms']:>8.2f}  "
+        f"p99 {result['p99_ms']:>8.2f} ms{queries}  errors {result['errors']}"
+    )
+
+
+def compare(current, baseline, tolerance):
+    """Print changes against ``baseline`` and return the regressions."""
+    regressions = []
+    for section in ("micro", "http"):
+        for name, now in current.get(section, {}).items():
+            before = baseline.get(section, {}).get(name)
+            if before is None:
+                continue
+            changes = []
+            for metric, higher_is_worse in (("p50_ms", True), ("p99_ms", True), ("rps", False)):
+                if not before[metric]:
+                    continue
+                delta = (now[metric] - before[metric]) / before[metric]
+                changes.append(f"{metric} {delta:+.0%}")
+                if (delta if higher_is_worse else -delta) > tolerance:
+                    regressions.append(f"{section}/{name}: {metric} {before[metric]:.2f} -> {now[metric]:.2f}")
+            if "queries" in now and now["queries"] > before.get("queries", now["queries"]):
+                regressions.append(f"{section}/{name}: queries {before['queries']} -> {now['queries']}")
+            print(f"{name:<22} " + "  ".join(changes))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic dataset")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--blogs", type=int, default=2000)
+    parser.add_argument("--comments", type=int, default=20, help="Average comments per blog")
+    parser.add_argument("--keepdb", action="store_true", help="Keep the seeded test database for the next run")
+    parser.add_argument("--iterations", type=int, default=200, help="Timed requests per micro-benchmark")
+    parser.add_argument("--warmup-iterations", type=int, default=20)
+    parser.add_argument("--scenarios", nargs="*", help="Only run these micro-benchmarks")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--url", help="Also run HTTP load scenarios against this server")
+    parser.add_argument("--username", help="User for the authenticated HTTP scenarios")
+    parser.add_argument("--password")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown before --compare fails")
+    args = parser.parse_args()
+
+    settings.CACHES["default"]["KEY_PREFIX"] = "benchmark"
+    django.setup()
+
+    results = {"meta": {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "seed": args.seed,
+        "size": {"users": args.users, "blogs": args.blogs, "comments_per_blog": args.comments},
+    }}
+    if not args.skip_micro:
+        results["micro"] = run_micro(args)
+    if args.url:
+        results["http"] = asyncio.run(run_http(args))
+        results["meta"]["http"] = {"url": args.url, "concurrency": args.concurrency, "duration": args.duration}
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as out:
+            json.dump(results, out, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
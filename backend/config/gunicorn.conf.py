@@ -0,0 +1,34 @@
+"""
+Gunicorn settings for serving the project over ASGI in production.
+
+    gunicorn -c config/gunicorn.conf.py config.asgi:application
+
+Each worker runs one uvicorn event loop, so the async read endpoints
+(``/api/async/...``) are served without a thread per request.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Recycle workers now and then so slow leaks never build up
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 1000))
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+
+
+def child_exit(server, worker):
+    # Prometheus multiprocess mode: clean up the files of a worker that exited
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
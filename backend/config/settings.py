@@ -16,6 +16,18 @@ SIMPLE_JWT = {
 # MongoDB Settings
 MONGO_URL = env("MONGO_URL", default="mongodb://mongo:27017/")
 MONGO_DB_NAME = "blog_sync"
+# Per-process client pool and timeouts (milliseconds)
+MONGO_MAX_POOL_SIZE = env.int("MONGO_MAX_POOL_SIZE", default=50)
+MONGO_MIN_POOL_SIZE = env.int("MONGO_MIN_POOL_SIZE", default=0)
+MONGO_CONNECT_TIMEOUT_MS = env.int("MONGO_CONNECT_TIMEOUT_MS", default=5000)
+MONGO_SERVER_SELECTION_TIMEOUT_MS = env.int("MONGO_SERVER_SELECTION_TIMEOUT_MS", default=5000)
+MONGO_SOCKET_TIMEOUT_MS = env.int("MONGO_SOCKET_TIMEOUT_MS", default=10000)
+# "majority" or a number of acknowledging members
+MONGO_WRITE_CONCERN = env("MONGO_WRITE_CONCERN", default="1")
+MONGO_WRITE_TIMEOUT_MS = env.int("MONGO_WRITE_TIMEOUT_MS", default=5000)
+# Where GET /api/blogs/ reads from: "postgres", or "mongo" for the blog_sync.blogs
+# read model (kept current by drain_mongo_outbox; searches with q stay on Postgres)
+BLOG_READ_MODEL = env("BLOG_READ_MODEL", default="postgres")
 # Base directory
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
@@ -34,6 +46,7 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Your apps
     'core',
@@ -42,15 +55,18 @@ INSTALLED_APPS = [
     'filemanager',
     'tinymce',
     'mptt',
+    'easy_thumbnails',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'core.middleware.RestrictSwaggerDocsMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -87,6 +103,28 @@ DATABASES = {
     }
 }
 
+# Connection reuse. With DB_POOL each process keeps a psycopg3 pool shared by
+# its threads; otherwise each thread keeps its own connection for DB_CONN_MAX_AGE
+# seconds. Size the pools so workers * DB_POOL_MAX_SIZE stays below max_connections.
+DB_POOL = env.bool("DB_POOL", default=True)
+# Ping a reused connection before handing it out
+DATABASES['default']['CONN_HEALTH_CHECKS'] = env.bool("DB_HEALTH_CHECKS", default=True)
+if DB_POOL:
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': env.int("DB_POOL_MIN_SIZE", default=2),
+            'max_size': env.int("DB_POOL_MAX_SIZE", default=10),
+            # Seconds a request waits for a free connection before failing
+            'timeout': env.float("DB_POOL_TIMEOUT", default=10.0),
+            'max_idle': env.float("DB_POOL_MAX_IDLE", default=300.0),
+            'max_lifetime': env.float("DB_POOL_MAX_LIFETIME", default=3600.0),
+        },
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = env.int("DB_CONN_MAX_AGE", default=60)
+# Seconds between each worker's pool stats snapshots in Redis
+DB_POOL_STATS_INTERVAL = env.int("DB_POOL_STATS_INTERVAL", default=10)
+
 # Redis for sessions
 CACHES = {
     "default": {
@@ -101,9 +139,37 @@ CACHES = {
 SESSION_ENGINE = "django.contrib.sessions.backends.cache"
 SESSION_CACHE_ALIAS = "default"
 
+# Seconds a cached blog listing page is served before it is refreshed
+LISTING_CACHE_TTL = env.int("LISTING_CACHE_TTL", default=60)
+# Token buckets per route, keyed by client IP or by a view argument ("username", "email")
+RATE_LIMITS = {
+    "login": {"ip": "30/m", "username": "5/m"},
+    "register": {"ip": "10/h"},
+    "forgot_password": {"ip": "10/h", "email": "3/h"},
+}
+RATE_LIMIT_TRUST_FORWARDED_FOR = env.bool("RATE_LIMIT_TRUST_FORWARDED_FOR", default=False)
+
+# Seconds a JWT-authenticated user (with permissions) stays cached between invalidations
+AUTH_USER_CACHE_TTL = env.int("AUTH_USER_CACHE_TTL", default=300)
+# Categories, tags and menus: Redis entry lifetime and per-process LRU size
+REFERENCE_CACHE_TTL = env.int("REFERENCE_CACHE_TTL", default=24 * 60 * 60)
+REFERENCE_CACHE_LOCAL_SIZE = env.int("REFERENCE_CACHE_LOCAL_SIZE", default=128)
+
+# Bearer token Prometheus scrapes /metrics with; staff with core.view_api_docs can also open it
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+# Per-request db/mongo/cache timings in a Server-Timing response header
+METRICS_SERVER_TIMING = env.bool("METRICS_SERVER_TIMING", default=True)
+# Profile 1 in N requests (0: only staff requests sent with an X-Profile header)
+PROFILE_SAMPLE_RATE = env.int("PROFILE_SAMPLE_RATE", default=0)
+# Milliseconds between stack samples of a profiled request, and seconds its report is kept
+PROFILE_INTERVAL_MS = env.float("PROFILE_INTERVAL_MS", default=1.0)
+PROFILE_REPORT_TTL = env.int("PROFILE_REPORT_TTL", default=24 * 60 * 60)
+
 AUTH_USER_MODEL = 'core.User'
 DEFAULT_FROM_EMAIL = "admin@example.com"
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+# Repeated password-reset requests for the same user within this many seconds send one email
+EMAIL_DEDUPE_WINDOW = env.int("EMAIL_DEDUPE_WINDOW", default=15 * 60)
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -127,3 +193,16 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'backend', 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Profile images: hard byte cap, max width/height and the square avatar sizes rendered in the background
+PROFILE_IMAGE_MAX_BYTES = env.int("PROFILE_IMAGE_MAX_BYTES", default=5 * 1024 * 1024)
+PROFILE_IMAGE_MAX_DIMENSION = env.int("PROFILE_IMAGE_MAX_DIMENSION", default=4096)
+AVATAR_SIZES = (64, 128, 256)
+
+# Widths rendered for Blog.main_image, in each of BLOG_IMAGE_FORMATS (name -> file extension)
+BLOG_IMAGE_WIDTHS = (320, 640, 960, 1280)
+BLOG_IMAGE_FORMATS = {"webp": "webp", "jpeg": "jpg"}
+THUMBNAIL_QUALITY = 80
+
+# Threads for work moved off the request path (image processing)
+BACKGROUND_WORKERS = env.int("BACKGROUND_WORKERS", default=2)
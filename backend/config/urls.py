@@ -2,14 +2,15 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
-from core.views import tinymce_image_upload
+from core.views import metrics, tinymce_image_upload
 from core.api import api
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('tinymce/', include('tinymce.urls')),
     path('upload-image/', tinymce_image_upload),
-    path('api/', api.urls)
+    path('api/', api.urls),
+    path('metrics', metrics),
 ]
 
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -1,11 +1,99 @@
 from django.contrib import admin
 from tinymce.widgets import TinyMCE
-from django.db import models
+from functools import partial
+from django.db import models, router, transaction
+from django.db.models import CASCADE, DO_NOTHING, SET_NULL
+from django.db.models.deletion import get_candidate_relations_to_delete
 from .models import User, Category, Tag, Blog, Menu, Comment
 from core.thread_locals import set_admin_request_flag
+from core.signals import (
+    MONGO_COLLECTIONS, enqueue_dependent_blogs, enqueue_mongo_sync_select, rebuild_category_tree,
+    invalidate_reference_groups,
+)
+from django.core.cache import cache
+from core.authentication import user_cache_keys
+from core.cache import bump_listing_generation
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
 
+def collect_deletion(model, ids):
+    """
+    Walk the ``on_delete`` relations from ``ids`` with ``values_list`` queries.
+
+    Returns the pks each model loses, keyed by model, and the ``(model, field,
+    ids)`` references that ``SET_NULL`` clears. Nested replies come one
+    ``parent_id__in`` query per level; no instance is ever loaded.
+    """
+    doomed, nulled = {}, []
+    pending = [(model, set(ids))]
+    while pending:
+        model, ids = pending.pop()
+        ids -= doomed.setdefault(model, set())
+        if not ids:
+            continue
+        doomed[model] |= ids
+        for relation in get_candidate_relations_to_delete(model._meta):
+            related, field = relation.related_model, relation.field.name
+            if relation.on_delete is CASCADE:
+                rows = related._base_manager.filter(**{f"{field}__in": ids})
+                pending.append((related, set(rows.values_list("pk", flat=True))))
+            elif relation.on_delete is SET_NULL:
+                nulled.append((related, field, ids))
+            elif relation.on_delete is not DO_NOTHING:
+                raise NotImplementedError(f"bulk_delete can't handle {related.__name__}.{field} on_delete")
+    return doomed, nulled
+
+
+def bulk_delete(model, ids):
+    """
+    Delete ``ids`` and everything that cascades from them in one transaction.
+
+    Rows are removed with raw ``DELETE ... WHERE id IN`` per model, so no
+    receiver runs; the Mongo mirror gets ``INSERT ... SELECT`` outbox rows for
+    the whole batch (cascaded comments and re-parented rows included) and each
+    cache is bumped once.
+    """
+    collections = {queryset.model: name for name, (queryset, _) in MONGO_COLLECTIONS.items()}
+    using = router.db_for_write(model)
+    with transaction.atomic(using=using):
+        doomed, nulled = collect_deletion(model, ids)
+
+        # Blog documents embed category and tag titles; queue the affected blogs before the rows go
+        for related_model in (Category, Tag):
+            if doomed.get(related_model):
+                enqueue_dependent_blogs(related_model, doomed[related_model])
+        for related_model, field, pks in nulled:
+            rows = related_model._base_manager.filter(**{f"{field}__in": pks})
+            # Blogs were queued above, and only when they are the listing's read model
+            if related_model in collections and related_model is not Blog:
+                enqueue_mongo_sync_select(collections[related_model], rows)
+            rows.update(**{field: None})
+        for related_model, pks in doomed.items():
+            if related_model in collections and pks:
+                enqueue_mongo_sync_select(collections[related_model], related_model._base_manager.filter(pk__in=pks))
+
+        if doomed.get(User):
+            # The rows are gone by commit time, so read the cached token versions now
+            transaction.on_commit(partial(cache.delete_many, user_cache_keys(doomed[User])), using=using)
+
+        for related_model, pks in reversed(doomed.items()):
+            if pks:
+                related_model._base_manager.filter(pk__in=pks)._raw_delete(using)
+
+        transaction.on_commit(bump_listing_generation, using=using)
+        for related_model in {*(m for m, pks in doomed.items() if pks), *(m for m, _, _ in nulled)}:
+            invalidate_reference_groups(related_model)
+
+
+class BulkDeleteMixin:
+    delete_batch_size = 1000
+
+    def delete_queryset(self, request, queryset):
+        ids = list(queryset.order_by("pk").values_list("pk", flat=True))
+        for start in range(0, len(ids), self.delete_batch_size):
+            bulk_delete(queryset.model, ids[start:start + self.delete_batch_size])
+
+
 class CustomTinyMCE(TinyMCE):
     def use_required_attribute(self, *args):
         return False
@@ -21,30 +109,13 @@ class CustomTinyMCE(TinyMCE):
         }
 
 @admin.register(Blog)
-class BlogAdmin(admin.ModelAdmin):
+class BlogAdmin(BulkDeleteMixin, admin.ModelAdmin):
     formfield_overrides = {
         models.TextField: {'widget': CustomTinyMCE()},
     }
 
-    def save_model(self, request, obj, form, change):
-        print("ADMIN edit TRIGGERED")
-        obj._from_admin = True
-        super().save_model(request, obj, form, change)
-
-    def delete_model(self, request, obj):
-        print("ADMIN DELETE TRIGGERED")
-        obj._from_admin = True
-        super().delete_model(request, obj)
-
-    def delete_queryset(self, request, queryset):
-        print("DELETE QUERYSET (bulk)")
-        set_admin_request_flag(True)
-        for obj in queryset:
-            obj._from_admin = True
-            obj.delete()
-
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(BulkDeleteMixin, admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         print('aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa')
         set_admin_request_flag(True)
@@ -55,9 +126,13 @@ class CategoryAdmin(admin.ModelAdmin):
         set_admin_request_flag(True)
         super().delete_model(request, obj)
 
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        rebuild_category_tree()
+
 
 @admin.register(Tag)
-class TagAdmin(admin.ModelAdmin):
+class TagAdmin(BulkDeleteMixin, admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         set_admin_request_flag(True)
         super().save_model(request, obj, form, change)
@@ -67,7 +142,7 @@ class TagAdmin(admin.ModelAdmin):
         super().delete_model(request, obj)
 
 @admin.register(Menu)
-class MenuAdmin(admin.ModelAdmin):
+class MenuAdmin(BulkDeleteMixin, admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         set_admin_request_flag(True)
         super().save_model(request, obj, form, change)
@@ -77,7 +152,7 @@ class MenuAdmin(admin.ModelAdmin):
         super().delete_model(request, obj)
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(BulkDeleteMixin, admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         set_admin_request_flag(True)
         super().save_model(request, obj, form, change)
@@ -87,7 +162,7 @@ class CommentAdmin(admin.ModelAdmin):
         super().delete_model(request, obj)
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(BulkDeleteMixin, BaseUserAdmin):
     fieldsets = BaseUserAdmin.fieldsets + (
         ("Additional Info", {"fields": ("profile_image",)}),
     )
@@ -1,40 +1,61 @@
-import base64
-from django.core.files.base import ContentFile
-from ninja import NinjaAPI
+from ninja import NinjaAPI, File
+from ninja.decorators import decorate_view
+from ninja.files import UploadedFile
 from ninja.security import HttpBearer
-from django.http import HttpRequest
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.contrib.postgres.expressions import ArraySubquery
+from asgiref.sync import sync_to_async
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib.auth.hashers import check_password
 from core.models import User, Comment, Blog, Tag, Category, Menu
-from ninja import Router
-from rest_framework_simplejwt.tokens import RefreshToken
+from ninja import Router, Query
 from django.contrib.auth import authenticate
-from core.schemas import (BlogIn, BlogOut, ErrorSchema, CommentIn, CommentOut, CommentEdit, CategoryOut, TagOut,
-                          MenuOut, ProfileUpdateSchema, RegisterSchema, ChangePasswordSchema, ForgotPasswordSchema, ResetPasswordSchema)
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from typing import List, Optional, Dict
-from django.db.models import Q
-from ninja.pagination import paginate, PageNumberPagination
+from core.schemas import (BlogIn, BlogOut, BlogFilters, ErrorSchema, CommentIn, CommentOut, CommentEdit, CommentThreadOut, VoteIn, VoteOut, CategoryOut, CategoryNode, TagOut,
+                          MenuOut, ProfileOut, ProfileUpdateSchema, RegisterSchema, ChangePasswordSchema, ForgotPasswordSchema, ResetPasswordSchema)
+from typing import List, Literal, Optional, Dict
+from ninja.pagination import paginate
 from django.contrib.auth import get_user_model
+from core.search import search_blogs
+from core.pagination import CursorPagination, SerializedPageNumberPagination
+from core.cache import cached_listing, acached_listing, listing_cache_stats, cached_reference_response, acached_reference_response
+from core.comment_tree import fetch_comment_thread, decode_thread_cursor
+from core.images import cap_profile_image_upload, decode_data_uri, set_profile_image, schedule_avatars, ImageRejected
+from core.emails import queue_email
+from core.ratelimit import rate_limited, RateLimited
+from core.authentication import VersionedRefreshToken, get_user_for_token, get_token_user
+from core.db_pool import db_pool_stats
+from core.profiling import get_report, list_reports, speedscope
+from core.read_model import BlogDocuments, reads_from_mongo
+from core.renderers import ORJSONRenderer, json_response
+from core.votes import record_vote, pending_vote_deltas, LIKE, DISLIKE, CLEAR
 
 class JWTAuth(HttpBearer):
     def authenticate(self, request, token):
-        validated_user = JWTAuthentication().authenticate(request)
-        if validated_user:
-            request.user, _ = validated_user
+        user = get_user_for_token(token)
+        if user:
+            request.user = user
+            return request.user
+
+
+class JWTClaimsAuth(HttpBearer):
+    """For endpoints that only need the user id: trusts the signed token and skips the DB."""
+    def authenticate(self, request, token):
+        user = get_token_user(token)
+        if user:
+            request.user = user
             return request.user
 
 
 class AdminOnlyAuth(HttpBearer):
     def authenticate(self, request: HttpRequest, token: str):
-        validated_user = JWTAuthentication().authenticate(request)
-        if not validated_user:
+        user = get_user_for_token(token)
+        if not user:
             return None
-        user = validated_user[0]
 
         if user.has_perm("core.view_api_docs"):
             request.user = user
@@ -47,18 +68,55 @@ api = NinjaAPI(
     version="1.0.0",
     docs_url="/docs",
     csrf=False,
+    renderer=ORJSONRenderer(),
 )
 
+@api.exception_handler(RateLimited)
+def rate_limited_handler(request, exc):
+    response = api.create_response(request, {"error": "Too many requests"}, status=429)
+    response["Retry-After"] = str(exc.retry_after)
+    return response
+
 # Optional test route
 @api.get("/ping")
 def ping(request):
     return {"message": "pong"}
 
+@api.get("/cache/stats", auth=AdminOnlyAuth())
+def cache_stats(request):
+    return {"listing": listing_cache_stats()}
+
+@api.get("/db/pool/stats", auth=AdminOnlyAuth())
+def pool_stats(request):
+    return db_pool_stats()
+
+@api.get("/profiles", auth=AdminOnlyAuth())
+def list_profiles(request):
+    return list_reports()
+
+@api.get("/profiles/{report_id}", response={200: dict, 404: ErrorSchema}, auth=AdminOnlyAuth())
+def get_profile_report(request, report_id: str, output: Literal["json", "speedscope", "collapsed"] = "json"):
+    """Full report; ``speedscope`` and ``collapsed`` download the stacks for speedscope.app or flamegraph.pl."""
+    report = get_report(report_id)
+    if report is None:
+        return 404, {"error": "Profile not found"}
+    if output == "json":
+        return report
+    if output == "speedscope":
+        response, filename = JsonResponse(speedscope(report)), f"{report_id}.speedscope.json"
+    else:
+        response, filename = HttpResponse(report["collapsed"], content_type="text/plain"), f"{report_id}.collapsed.txt"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
 auth_router = Router()
 blog_router = Router()
 comment_router = Router()
+# Async twins of the hot read endpoints, for deployments served over ASGI
+async_router = Router()
 
 @auth_router.post("/login")
+@rate_limited("login")
 def login(request, username: str, password: str):
     try:
         user = User.objects.get(username=username)
@@ -72,13 +130,19 @@ def login(request, username: str, password: str):
     if not user:
         return {"error": "Invalid credentials"}
 
-    refresh = RefreshToken.for_user(user)
+    return issue_tokens(user)
+
+
+def issue_tokens(user):
+    refresh = VersionedRefreshToken.for_user(user)
     return {
         "access": str(refresh.access_token),
         "refresh": str(refresh),
     }
 
+
 @auth_router.post("/register")
+@rate_limited("register")
 def register(request, data: RegisterSchema):
     if User.objects.filter(username=data.username).exists():
         return {"error": "Username already exists"}
@@ -92,23 +156,20 @@ def register(request, data: RegisterSchema):
 
     if data.profile_image:
         try:
-            format, imgstr = data.profile_image.split(";base64,")
-            ext = format.split("/")[-1]
-            user.profile_image.save(
-                f"profile.{ext}",
-                ContentFile(base64.b64decode(imgstr)),
-                save=False
-            )
-        except Exception:
-            return {"error": "Invalid image format"}
+            with decode_data_uri(data.profile_image, settings.PROFILE_IMAGE_MAX_BYTES) as image:
+                set_profile_image(user, image)
+        except ImageRejected as exc:
+            return {"error": str(exc)}
 
     user.save()
+    if user.profile_image:
+        schedule_avatars(user)
 
     uid = urlsafe_base64_encode(force_bytes(user.pk))
     token = default_token_generator.make_token(user)
     activation_link = f"http://localhost:8000/api/auth/activate/{uid}/{token}"
 
-    send_mail(
+    queue_email(
         subject="Activate your account",
         message=f"Click to activate: {activation_link}",
         from_email=settings.DEFAULT_FROM_EMAIL,
@@ -134,9 +195,23 @@ def activate_user(request, uidb64: str, token: str):
         return {"error": "Activation link is invalid or expired."}
 
 
+@auth_router.get("/profile", response=ProfileOut, auth=JWTAuth())
+def get_profile(request):
+    # request.auth only has the auth fields loaded
+    user = User.objects.get(pk=request.auth.pk)
+    return {
+        "username": user.username,
+        "email": user.email,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "profile_image": user.profile_image.url if user.profile_image else None,
+        "avatars": user.avatars,
+    }
+
+
 @auth_router.put("/profile", auth=JWTAuth())
 def update_profile(request, data: ProfileUpdateSchema):
-    user = request.auth
+    user = User.objects.get(pk=request.auth.pk)
 
     if data.first_name is not None:
         user.first_name = data.first_name
@@ -146,31 +221,52 @@ def update_profile(request, data: ProfileUpdateSchema):
         user.email = data.email
 
     if data.profile_image:
-        # Accept base64 string and save as image
-        format, imgstr = data.profile_image.split(";base64,")
-        ext = format.split("/")[-1]
-        user.profile_image.save(f"profile.{ext}", ContentFile(base64.b64decode(imgstr)), save=False)
+        # Legacy path: base64 data URI inside the JSON body
+        try:
+            with decode_data_uri(data.profile_image, settings.PROFILE_IMAGE_MAX_BYTES) as image:
+                replaced = set_profile_image(user, image)
+        except ImageRejected as exc:
+            return {"error": str(exc)}
 
     user.save()
+    if data.profile_image:
+        schedule_avatars(user, replaced)
+    return {"success": True}
+
+
+@auth_router.post("/profile/image", auth=JWTAuth())
+@decorate_view(cap_profile_image_upload)
+def upload_profile_image(request, file: UploadedFile = File(...)):
+    # The cap is enforced while Django streams the upload to a temp file (413 past PROFILE_IMAGE_MAX_BYTES)
+    user = User.objects.get(pk=request.auth.pk)
+    try:
+        replaced = set_profile_image(user, file)
+    except ImageRejected as exc:
+        return {"error": str(exc)}
+    user.save(update_fields=["profile_image"])
+    schedule_avatars(user, replaced)
     return {"success": True}
 
 
 @auth_router.put("/change-password", auth=JWTAuth())
 def change_password(request, data: ChangePasswordSchema):
-    user = request.auth
+    user = User.objects.get(pk=request.auth.pk)
 
     if not check_password(data.old_password, user.password):
         return {"error": "Old password is incorrect"}
 
     user.set_password(data.new_password)
+    # Sign out every other session; this one gets fresh tokens
+    user.token_version += 1
     user.save()
-    return {"success": True}
+    return {"success": True, **issue_tokens(user)}
 
 
 User = get_user_model()
 
 
 @auth_router.post("/forgot-password")
+@rate_limited("forgot_password")
 def forgot_password(request, data: ForgotPasswordSchema):
     try:
         user = User.objects.get(email=data.email)
@@ -182,11 +278,12 @@ def forgot_password(request, data: ForgotPasswordSchema):
 
     reset_link = f"http://localhost:8000/api/auth/reset-password-confirm/{uid}/{token}"
 
-    send_mail(
+    queue_email(
         subject="Reset your password",
         message=f"Click the link to reset your password: {reset_link}",
         from_email=None,
         recipient_list=[user.email],
+        dedupe_key=f"password_reset:{user.pk}",
     )
 
     return {"success": "Password reset link sent to your email"}
@@ -204,6 +301,7 @@ def reset_password_confirm(request, uidb64: str, token: str, data: ResetPassword
         return {"error": "Invalid or expired token"}
 
     user.set_password(data.new_password)
+    user.token_version += 1
     user.save()
     return {"success": "Password has been reset"}
 
@@ -218,57 +316,113 @@ def create_blog(request, data: BlogIn):
         is_active=data.is_active
     )
     blog.tags.set(data.tag_ids)
+    return blog_out(blog)
+
+
+def filter_blogs(filters: BlogFilters):
+    blogs = Blog.objects.filter(is_active=True)
+
+    if filters.q:
+        blogs = search_blogs(blogs, filters.q, rank=filters.sort == "relevance")
+    if filters.author:
+        blogs = blogs.filter(author__username__iexact=filters.author)
+    if filters.category and filters.include_descendants:
+        # A subtree is a contiguous lft range within one tree. The bounds are
+        # subqueries so the queryset stays lazy and works from async views too.
+        subtree = Category.objects.filter(id=filters.category)
+        blogs = blogs.filter(
+            category__tree_id=Subquery(subtree.values("tree_id")[:1]),
+            category__lft__gte=Subquery(subtree.values("lft")[:1]),
+            category__lft__lte=Subquery(subtree.values("rght")[:1]),
+        )
+    elif filters.category:
+        blogs = blogs.filter(category_id=filters.category)
+    if filters.tag:
+        blogs = blogs.filter(tags__id=filters.tag)
+    if filters.date_from:
+        blogs = blogs.filter(created_at__date__gte=filters.date_from)
+    if filters.date_to:
+        blogs = blogs.filter(created_at__date__lte=filters.date_to)
+    return blogs
+
+
+def blog_out(blog):
     return BlogOut(
         id=blog.id,
         title=blog.title,
         description=blog.description,
         category=blog.category.title if blog.category else "",
         tags=[tag.title for tag in blog.tags.all()],
-        created_at=str(blog.created_at),
+        created_at=blog.created_at,
         is_active=blog.is_active,
         author=blog.author.username,
+        main_image=blog.main_image.url if blog.main_image else None,
+        image_variants=blog.image_variants,
     )
 
 
+blog_image_storage = Blog._meta.get_field("main_image").storage
+
+
+def blog_listing(filters: BlogFilters):
+    """The listing's source: the Mongo read model when ``BLOG_READ_MODEL`` says so, else Postgres."""
+    if reads_from_mongo(filters):
+        return BlogDocuments.matching(filters)
+    return filter_blogs(filters)
+
+
+def blog_rows(blogs):
+    """The ``BlogOut`` columns as tuples, tags included, in one query and without model instances."""
+    if isinstance(blogs, BlogDocuments):
+        # Documents already come out as rows
+        return blogs
+    tags = ArraySubquery(
+        Blog.tags.through.objects.filter(blog_id=OuterRef("pk")).order_by("id").values("tag__title")
+    )
+    return blogs.values_list(
+        "id", "title", "description", Coalesce("category__title", Value("")), tags, "created_at",
+        "is_active", "author__username", "main_image", "image_variants",
+    )
+
+
+def blog_row_out(row):
+    """``blog_out`` for a ``blog_rows`` tuple: a plain dict shaped like ``BlogOut``."""
+    blog_id, title, description, category, tags, created_at, is_active, author, main_image, image_variants = row
+    return {
+        "id": blog_id,
+        "title": title,
+        "description": description,
+        "category": category,
+        "tags": tags,
+        "created_at": created_at,
+        "is_active": is_active,
+        "author": author,
+        "main_image": blog_image_storage.url(main_image) if main_image else None,
+        "image_variants": image_variants,
+    }
+
+
 @api.get("/blogs/", response=List[BlogOut])
-@paginate(PageNumberPagination)
-def list_blogs(
-    request,
-    q: Optional[str] = None,
-    author: Optional[str] = None,
-    category: Optional[int] = None,
-    tag: Optional[int] = None,
-    date_from: Optional[str] = None,
-    date_to: Optional[str] = None,
-):
-    blogs = Blog.objects.select_related('category', 'author').prefetch_related('tags').filter(is_active=True)
-
-    if q:
-        blogs = blogs.filter(Q(title__icontains=q) | Q(description__icontains=q))
-    if author:
-        blogs = blogs.filter(author__username__iexact=author)
-    if category:
-        blogs = blogs.filter(category_id=category)
-    if tag:
-        blogs = blogs.filter(tags__id=tag)
-    if date_from:
-        blogs = blogs.filter(created_at__date__gte=date_from)
-    if date_to:
-        blogs = blogs.filter(created_at__date__lte=date_to)
-
-    return [
-        BlogOut(
-            id=blog.id,
-            title=blog.title,
-            description=blog.description,
-            category=blog.category.title if blog.category else "",
-            tags=[tag.title for tag in blog.tags.all()],
-            created_at=blog.created_at,
-            is_active=blog.is_active,
-            author=blog.author.username,
-        )
-        for blog in blogs
-    ]
+@cached_listing
+@paginate(SerializedPageNumberPagination, rows=blog_rows, serializer=blog_row_out)
+def list_blogs(request, filters: BlogFilters = Query(...)):
+    return blog_listing(filters)
+
+
+@async_router.get("/blogs/", response=List[BlogOut])
+@acached_listing
+@paginate(SerializedPageNumberPagination, rows=blog_rows, serializer=blog_row_out)
+async def alist_blogs(request, filters: BlogFilters = Query(...)):
+    return blog_listing(filters)
+
+
+@api.get("/blogs/feed", response=List[BlogOut])
+@cached_listing
+@paginate(CursorPagination, serializer=blog_out)
+def list_blogs_feed(request, filters: BlogFilters = Query(...)):
+    # Keyset order is fixed to (created_at, id), so ``sort`` is ignored here
+    filters.sort = None
+    return filter_blogs(filters).select_related('category', 'author').prefetch_related('tags')
 
 
 @api.put("/blogs/{blog_id}", response={200: BlogOut, 403: ErrorSchema}, auth=JWTAuth())
@@ -285,16 +439,7 @@ def update_blog(request, blog_id: int, data: BlogIn):
     blog.save()
     blog.tags.set(data.tag_ids)
 
-    return BlogOut(
-        id=blog.id,
-        title=blog.title,
-        description=blog.description,
-        category=blog.category.title if blog.category else "",
-        tags=[tag.title for tag in blog.tags.all()],
-        created_at=blog.created_at,
-        is_active=blog.is_active,
-        author=blog.author.username,
-    )
+    return blog_out(blog)
 
 
 @api.delete("/blogs/{blog_id}", response={200: Dict[str, bool], 403: ErrorSchema},auth=JWTAuth())
@@ -308,20 +453,85 @@ def delete_blog(request, blog_id: int):
     return {"success": True}
 
 
+COMMENT_COLUMNS = ("id", "content", "blog_id", "author__username", "parent_id", "like", "dislike")
+
+
 @api.get("/comments/", response=List[CommentOut])
 def list_comments(request, blog: int):
-    comments = Comment.objects.filter(blog_id=blog).select_related("author", "parent")
-    return [
-        CommentOut(
-            id=c.id,
-            content=c.content,
-            blog_id=c.blog_id,
-            author=c.author.username,
-            parent_id=c.parent.id if c.parent else None,
-            like=c.like,
-            dislike=c.dislike,
-        ) for c in comments
-    ]
+    rows = list(Comment.objects.filter(blog_id=blog).values_list(*COMMENT_COLUMNS))
+    deltas = pending_vote_deltas(row[0] for row in rows)
+    return json_response([comment_row_out(row, deltas) for row in rows])
+
+
+@async_router.get("/comments/", response=List[CommentOut])
+async def alist_comments(request, blog: int):
+    rows = [row async for row in Comment.objects.filter(blog_id=blog).values_list(*COMMENT_COLUMNS)]
+    deltas = await sync_to_async(pending_vote_deltas)([row[0] for row in rows])
+    return json_response([comment_row_out(row, deltas) for row in rows])
+
+
+def comment_row_out(row, deltas):
+    """A ``COMMENT_COLUMNS`` tuple with its pending vote deltas, as a plain dict shaped like ``CommentOut``."""
+    comment_id, content, blog_id, author, parent_id, like, dislike = row
+    like_delta, dislike_delta = deltas.get(comment_id, (0, 0))
+    return {
+        "id": comment_id,
+        "content": content,
+        "blog_id": blog_id,
+        "author": author,
+        "parent_id": parent_id,
+        "like": like + like_delta,
+        "dislike": dislike + dislike_delta,
+    }
+
+
+@api.get("/comments/tree", response=CommentThreadOut)
+def list_comment_thread(
+    request,
+    blog: int,
+    cursor: Optional[str] = None,
+    page_size: int = Query(20, ge=1, le=100),
+    depth: int = Query(3, ge=0, le=10),
+    breadth: int = Query(5, ge=1, le=50),
+):
+    parent_id, after_id = decode_thread_cursor(cursor) if cursor else (None, 0)
+    items, next_cursor = fetch_comment_thread(blog, parent_id, after_id, page_size, depth, breadth)
+    apply_pending_votes(items)
+    return {"items": items, "next": next_cursor}
+
+
+def apply_pending_votes(nodes):
+    flat = []
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        flat.append(node)
+        stack.extend(node["replies"])
+    deltas = pending_vote_deltas(node["id"] for node in flat)
+    for node in flat:
+        like, dislike = deltas.get(node["id"], (0, 0))
+        node["like"] += like
+        node["dislike"] += dislike
+
+
+@api.post("/comments/{comment_id}/vote", response={200: VoteOut, 404: ErrorSchema}, auth=JWTClaimsAuth())
+def vote_comment(request, comment_id: int, data: VoteIn):
+    return set_comment_vote(comment_id, request.user.id, LIKE if data.value == "like" else DISLIKE)
+
+
+@api.delete("/comments/{comment_id}/vote", response={200: VoteOut, 404: ErrorSchema}, auth=JWTClaimsAuth())
+def unvote_comment(request, comment_id: int):
+    return set_comment_vote(comment_id, request.user.id, CLEAR)
+
+
+def set_comment_vote(comment_id, user_id, value):
+    counts = Comment.objects.filter(id=comment_id).values_list("like", "dislike").first()
+    if counts is None:
+        return 404, {"error": "Comment not found"}
+
+    record_vote(comment_id, user_id, value)
+    like, dislike = pending_vote_deltas([comment_id]).get(comment_id, (0, 0))
+    return {"like": counts[0] + like, "dislike": counts[1] + dislike}
 
 
 @api.post("/comments/", response={200: CommentOut, 400: ErrorSchema}, auth=JWTAuth())
@@ -393,19 +603,65 @@ def delete_comment(request, comment_id: int):
 
 @api.get("/categories/", response=List[CategoryOut])
 def get_categories(request):
-    return Category.objects.all()
+    return cached_reference_response(request, "categories", "list", lambda: [
+        CategoryOut.from_orm(category).model_dump() for category in Category.objects.order_by("tree_id", "lft")
+    ])
+
+
+@async_router.get("/categories/", response=List[CategoryOut])
+async def aget_categories(request):
+    return await acached_reference_response(request, "categories", "list", lambda: aserialize(
+        CategoryOut, Category.objects.order_by("tree_id", "lft")
+    ))
+
+
+@api.get("/categories/tree", response=List[CategoryNode])
+def get_category_tree(request):
+    return cached_reference_response(request, "categories", "tree", lambda: [
+        category_node(root) for root in Category.objects.all().get_cached_trees()
+    ])
+
+
+def category_node(category):
+    return {
+        "id": category.id,
+        "title": category.title,
+        "parent_id": category.parent_id,
+        "children": [category_node(child) for child in category.get_children()],
+    }
 
 
 @api.get("/tags/", response=List[TagOut])
 def get_tags(request):
-    return Tag.objects.all()
+    return cached_reference_response(request, "tags", "list", lambda: [
+        TagOut.from_orm(tag).model_dump() for tag in Tag.objects.all()
+    ])
+
+
+@async_router.get("/tags/", response=List[TagOut])
+async def aget_tags(request):
+    return await acached_reference_response(request, "tags", "list", lambda: aserialize(TagOut, Tag.objects.all()))
 
 
 @api.get("/menus/", response=List[MenuOut])
 def get_menus(request):
-    return Menu.objects.order_by("order")
+    return cached_reference_response(request, "menus", "list", lambda: [
+        MenuOut.from_orm(menu).model_dump() for menu in Menu.objects.order_by("order")
+    ])
+
+
+@async_router.get("/menus/", response=List[MenuOut])
+async def aget_menus(request):
+    return await acached_reference_response(request, "menus", "list", lambda: aserialize(
+        MenuOut, Menu.objects.order_by("order")
+    ))
+
+
+async def aserialize(schema, queryset):
+    return [schema.from_orm(obj).model_dump() async for obj in queryset]
 
 
 api.add_router("/auth", auth_router)
 api.add_router("/blogs", blog_router)
-api.add_router("/comments", comment_router)
\ No newline at end of file
+api.add_router("/comments", comment_router)
+api.add_router("/async", async_router)
\ No newline at end of file
@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.cache import incr_counter
+from core.metrics import record_cache
+from core.models import User
+
+PERMISSION_GENERATION_KEY = "auth:permission_generation"
+TOKEN_VERSION_CLAIM = "ver"
+
+# What JWT-authenticated views read from request.auth; other fields load on access
+AUTH_USER_FIELDS = ("id", "username", "is_active", "is_staff", "is_superuser", "token_version")
+
+jwt_authentication = JWTAuthentication()
+jwt_stateless_authentication = JWTStatelessUserAuthentication()
+
+
+class VersionedRefreshToken(RefreshToken):
+    """Carries ``User.token_version``; bumping it retires every token issued before."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
+
+
+def user_cache_key(user_id, token_version):
+    return f"auth:user:{user_id}:{token_version}"
+
+
+def invalidate_user(user_id, *token_versions):
+    cache.delete_many([user_cache_key(user_id, version) for version in token_versions])
+
+
+def user_cache_keys(user_ids):
+    rows = User.objects.filter(pk__in=user_ids).values_list("id", "token_version")
+    return [user_cache_key(user_id, version) for user_id, version in rows]
+
+
+def invalidate_users(user_ids):
+    """For callers that only have ids: looks up the current token versions."""
+    cache.delete_many(user_cache_keys(user_ids))
+
+
+def bump_permission_generation():
+    # Group/permission edits can affect any user, so they retire every cached entry at once
+    incr_counter(PERMISSION_GENERATION_KEY)
+
+
+def get_cached_user(user_id, token_version):
+    """
+    Load a user with its permissions preloaded, from Redis when possible.
+
+    Entries are ``(generation, fields, permissions)``, keyed by the token
+    version, and only hold ``AUTH_USER_FIELDS``: the user is rebuilt with the
+    rest deferred and ``_perm_cache`` set, so ``has_perm`` needs no query.
+    Returns None when the token's version is no longer the user's.
+    The entry and the current permission generation come back in one round trip.
+    """
+    key = user_cache_key(user_id, token_version)
+    cached = cache.get_many([key, PERMISSION_GENERATION_KEY])
+    generation = cached.get(PERMISSION_GENERATION_KEY, 0)
+    entry = cached.get(key)
+    hit = entry is not None and entry[0] == generation
+    record_cache("auth_user", hit)
+    if hit:
+        _, fields, permissions = entry
+        # from_db() wants the values in model field order
+        values = [fields[f.attname] for f in User._meta.concrete_fields if f.attname in fields]
+        user = User.from_db(User.objects.db, AUTH_USER_FIELDS, values)
+        user._perm_cache = permissions
+        return user
+
+    user = User.objects.filter(pk=user_id).only(*AUTH_USER_FIELDS).first()
+    if user is None or user.token_version != token_version:
+        return None
+    permissions = user.get_all_permissions()
+    fields = {name: getattr(user, name) for name in AUTH_USER_FIELDS}
+    cache.set(key, (generation, fields, permissions), timeout=settings.AUTH_USER_CACHE_TTL)
+    return user
+
+
+def get_user_for_token(token):
+    try:
+        validated_token = jwt_authentication.get_validated_token(token)
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+    except (InvalidToken, TokenError, KeyError):
+        return None
+    # Tokens issued before versioning count as version 0
+    user = get_cached_user(user_id, validated_token.get(TOKEN_VERSION_CLAIM, 0))
+    if user is None or not user.is_active:
+        return None
+    return user
+
+
+def get_token_user(token):
+    """Claims-only resolution: a ``TokenUser`` built from the verified token, no DB or cache access."""
+    try:
+        return jwt_stateless_authentication.get_user(jwt_stateless_authentication.get_validated_token(token))
+    except (InvalidToken, TokenError):
+        return None
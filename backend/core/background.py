@@ -0,0 +1,34 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF = 300
+
+executor = ThreadPoolExecutor(max_workers=settings.BACKGROUND_WORKERS, thread_name_prefix="core-background")
+
+
+def run_task(func, *args):
+    # Pool threads keep their own DB connections; don't let them go stale
+    close_old_connections()
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Background task %s failed", getattr(func, "__name__", func))
+    finally:
+        close_old_connections()
+
+
+def submit_after_commit(func, *args):
+    """Run ``func(*args)`` in the background pool once the current transaction commits."""
+    transaction.on_commit(partial(executor.submit, run_task, func, *args))
+
+
+def retry_backoff(attempts):
+    """Delay before retry number ``attempts`` of a queue item: 2, 4, 8 ... seconds, capped at 5 minutes."""
+    return timedelta(seconds=min(2 ** attempts, MAX_BACKOFF))
@@ -0,0 +1,309 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+
+from core.metrics import record_cache
+from core.renderers import JSON_CONTENT_TYPE, dumps
+
+LISTING_GENERATION_KEY = "listing_cache:generation"
+LISTING_HITS_KEY = "listing_cache:hits"
+LISTING_MISSES_KEY = "listing_cache:misses"
+
+# How long a recompute may hold the lock, and how long waiters poll for its result
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2.0
+LOCK_POLL_INTERVAL = 0.05
+
+
+def incr_counter(key, delta=1):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key, delta)
+
+
+async def aincr_counter(key, delta=1):
+    # The backend's aincr() is a non-atomic get/set, so keep using the atomic INCR
+    return await sync_to_async(incr_counter)(key, delta)
+
+
+def count_listing_lookup(hit):
+    record_cache("listing", hit)
+    incr_counter(LISTING_HITS_KEY if hit else LISTING_MISSES_KEY)
+
+
+async def acount_listing_lookup(hit):
+    record_cache("listing", hit)
+    await aincr_counter(LISTING_HITS_KEY if hit else LISTING_MISSES_KEY)
+
+
+def get_listing_generation():
+    generation = cache.get(LISTING_GENERATION_KEY)
+    if generation is None:
+        # Seed from the clock so a flushed Redis never readdresses entries cached before it
+        cache.add(LISTING_GENERATION_KEY, int(time.time() * 1000), timeout=None)
+        generation = cache.get(LISTING_GENERATION_KEY)
+    return generation
+
+
+async def aget_listing_generation():
+    generation = await cache.aget(LISTING_GENERATION_KEY)
+    if generation is None:
+        await cache.aadd(LISTING_GENERATION_KEY, int(time.time() * 1000), timeout=None)
+        generation = await cache.aget(LISTING_GENERATION_KEY)
+    return generation
+
+
+def bump_listing_generation():
+    # Old entries are never deleted, they just stop being addressed and age out by TTL
+    try:
+        return cache.incr(LISTING_GENERATION_KEY)
+    except ValueError:
+        return get_listing_generation()
+
+
+def listing_cache_stats():
+    hits = cache.get(LISTING_HITS_KEY, 0)
+    misses = cache.get(LISTING_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / total if total else 0.0,
+        "generation": get_listing_generation(),
+    }
+
+
+def listing_cache_key(request, generation=None):
+    if generation is None:
+        generation = get_listing_generation()
+    params = sorted((k, v) for k, v in request.GET.items() if v != "")
+    digest = hashlib.sha1(urlencode(params).encode()).hexdigest()
+    # Entries hold the rendered JSON body of the page
+    return f"listing_cache:{generation}:{request.path}:{digest}.json"
+
+
+def get_or_compute(key, compute, ttl):
+    """
+    Read-through lookup with single-flight recompute.
+
+    Entries are stored as ``(value, refresh_at)`` and kept for twice their TTL.
+    Past ``refresh_at`` one caller takes the lock and recomputes while everyone
+    else keeps serving the stale value, so an expiring hot key never sends a
+    burst of identical queries to Postgres.
+    """
+    lock_key = f"{key}:lock"
+    entry = cache.get(key)
+    if entry is not None:
+        value, refresh_at = entry
+        if time.time() < refresh_at or not cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+            count_listing_lookup(True)
+            return value
+    elif not cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        # Someone else is already computing this key, wait for their result
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                count_listing_lookup(True)
+                return entry[0]
+        count_listing_lookup(False)
+        return compute()
+
+    count_listing_lookup(False)
+    try:
+        value = compute()
+        cache.set(key, (value, time.time() + ttl), timeout=ttl * 2)
+    finally:
+        cache.delete(lock_key)
+    return value
+
+
+async def aget_or_compute(key, compute, ttl):
+    """``get_or_compute`` for async views; ``compute`` is a coroutine function."""
+    lock_key = f"{key}:lock"
+    entry = await cache.aget(key)
+    if entry is not None:
+        value, refresh_at = entry
+        if time.time() < refresh_at or not await cache.aadd(lock_key, 1, timeout=LOCK_TIMEOUT):
+            await acount_listing_lookup(True)
+            return value
+    elif not await cache.aadd(lock_key, 1, timeout=LOCK_TIMEOUT):
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            entry = await cache.aget(key)
+            if entry is not None:
+                await acount_listing_lookup(True)
+                return entry[0]
+        await acount_listing_lookup(False)
+        return await compute()
+
+    await acount_listing_lookup(False)
+    try:
+        value = await compute()
+        await cache.aset(key, (value, time.time() + ttl), timeout=ttl * 2)
+    finally:
+        await cache.adelete(lock_key)
+    return value
+
+
+def listing_response(body):
+    return HttpResponse(body, content_type=JSON_CONTENT_TYPE)
+
+
+def cached_listing(view_func):
+    """
+    Cache a (paginated) listing view by its normalized query string.
+
+    The page is stored rendered, and hits are served as is: neither a hit nor
+    a miss is validated against the response schema again.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        def compute():
+            return dumps(view_func(request, *args, **kwargs))
+
+        return listing_response(get_or_compute(listing_cache_key(request), compute, settings.LISTING_CACHE_TTL))
+
+    return wrapper
+
+
+def acached_listing(view_func):
+    """``cached_listing`` for async views."""
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        async def compute():
+            return dumps(await view_func(request, *args, **kwargs))
+
+        key = listing_cache_key(request, await aget_listing_generation())
+        return listing_response(await aget_or_compute(key, compute, settings.LISTING_CACHE_TTL))
+
+    return wrapper
+
+
+class LocalLRU:
+    """Small thread-safe in-process LRU; the first tier in front of Redis."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.data.get(key)
+            if value is not None:
+                self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+
+reference_lru = LocalLRU(settings.REFERENCE_CACHE_LOCAL_SIZE)
+
+
+def reference_version_key(group):
+    return f"reference_cache:version:{group}"
+
+
+def get_reference_version(group):
+    key = reference_version_key(group)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a flushed Redis never reissues an old version
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_reference_version(group):
+    key = reference_version_key(group)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, int(time.time() * 1000), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_reference_version(group):
+    try:
+        return cache.incr(reference_version_key(group))
+    except ValueError:
+        return get_reference_version(group)
+
+
+def etag_matches(request, etag):
+    header = request.headers.get("If-None-Match", "")
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def cached_reference_response(request, group, variant, compute):
+    """
+    Serve reference data through in-process LRU -> Redis -> ``compute()``.
+
+    Entries are addressed by the group's current version, so a version bump
+    from the model receivers invalidates every worker's LRU and Redis at once.
+    Responses carry a strong content-hash ETag and matching ``If-None-Match``
+    requests get a 304 without touching Postgres.
+    """
+    key = f"reference_cache:{group}:{get_reference_version(group)}:{variant}"
+    entry = reference_lru.get(key)
+    if entry is not None:
+        record_cache("reference_local", True)
+    else:
+        entry = cache.get(key)
+        record_cache("reference", entry is not None)
+        if entry is None:
+            entry = reference_entry(compute())
+            cache.set(key, entry, timeout=settings.REFERENCE_CACHE_TTL)
+        reference_lru.set(key, entry)
+    return reference_response(request, entry)
+
+
+async def acached_reference_response(request, group, variant, compute):
+    """``cached_reference_response`` for async views; ``compute`` is a coroutine function."""
+    key = f"reference_cache:{group}:{await aget_reference_version(group)}:{variant}"
+    entry = reference_lru.get(key)
+    if entry is not None:
+        record_cache("reference_local", True)
+    else:
+        entry = await cache.aget(key)
+        record_cache("reference", entry is not None)
+        if entry is None:
+            entry = reference_entry(await compute())
+            await cache.aset(key, entry, timeout=settings.REFERENCE_CACHE_TTL)
+        reference_lru.set(key, entry)
+    return reference_response(request, entry)
+
+
+def reference_entry(data):
+    body = dumps(data)
+    return f'"{hashlib.sha1(body).hexdigest()}"', body
+
+
+def reference_response(request, entry):
+    etag, body = entry
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    return response
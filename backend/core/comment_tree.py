@@ -0,0 +1,108 @@
+from django.db import connection
+from ninja.errors import HttpError
+
+from core.models import Comment, User
+from core.pagination import decode_payload, encode_payload
+
+# One round trip: a page of root comments, then up to ``breadth`` replies per
+# comment for ``depth`` levels. Every level fetches one extra row per parent so
+# we know whether to hand out a "load more" cursor without counting.
+THREAD_SQL = """
+WITH RECURSIVE roots AS (
+    SELECT id, row_number() OVER (ORDER BY id) AS rn
+    FROM {comment}
+    WHERE blog_id = %(blog)s AND {root_condition} AND id > %(after)s
+    ORDER BY id
+    LIMIT %(page_size)s + 1
+), thread AS (
+    SELECT id, 0 AS depth, rn FROM roots
+    UNION ALL
+    SELECT child.id, thread.depth + 1, child.rn
+    FROM thread
+    CROSS JOIN LATERAL (
+        SELECT c.id, row_number() OVER (ORDER BY c.id) AS rn
+        FROM {comment} c
+        WHERE c.parent_id = thread.id
+        ORDER BY c.id
+        LIMIT %(breadth)s + 1
+    ) child
+    WHERE thread.depth < %(depth)s
+      AND thread.rn <= CASE WHEN thread.depth = 0 THEN %(page_size)s ELSE %(breadth)s END
+)
+SELECT c.id, c.content, c.blog_id, u.username, c.parent_id, c."like", c.dislike, thread.depth, thread.rn,
+       thread.depth = %(depth)s AND EXISTS (SELECT 1 FROM {comment} r WHERE r.parent_id = c.id) AS truncated
+FROM thread
+JOIN {comment} c ON c.id = thread.id
+JOIN {user} u ON u.id = c.author_id
+ORDER BY thread.depth, c.id
+"""
+
+
+def encode_thread_cursor(parent_id, after_id):
+    return encode_payload({"p": parent_id, "a": after_id})
+
+
+def decode_thread_cursor(cursor):
+    try:
+        payload = decode_payload(cursor)
+        parent_id = payload["p"]
+        return (int(parent_id) if parent_id is not None else None), int(payload["a"])
+    except (ValueError, KeyError, TypeError):
+        raise HttpError(400, "Invalid cursor")
+
+
+def fetch_comment_thread(blog_id, parent_id=None, after_id=0, page_size=20, depth=3, breadth=5):
+    """
+    Return ``(roots, next_cursor)`` where roots are nested comment dicts.
+
+    Roots are the children of ``parent_id`` (top-level comments when None)
+    with id greater than ``after_id``. Work is bounded by
+    ``page_size * breadth ** depth`` regardless of thread size.
+    """
+    sql = THREAD_SQL.format(
+        comment=connection.ops.quote_name(Comment._meta.db_table),
+        user=connection.ops.quote_name(User._meta.db_table),
+        root_condition="parent_id IS NULL" if parent_id is None else "parent_id = %(parent)s",
+    )
+    params = {
+        "blog": blog_id,
+        "parent": parent_id,
+        "after": after_id,
+        "page_size": page_size,
+        "depth": depth,
+        "breadth": breadth,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    nodes = {}
+    roots = []
+    next_cursor = None
+    for id_, content, blog, author, parent, like, dislike, level, rn, truncated in rows:
+        if level == 0 and rn > page_size:
+            next_cursor = encode_thread_cursor(parent_id, roots[-1]["id"])
+            continue
+        if level > 0 and rn > breadth:
+            siblings = nodes[parent]["replies"]
+            nodes[parent]["replies_cursor"] = encode_thread_cursor(parent, siblings[-1]["id"])
+            continue
+
+        node = {
+            "id": id_,
+            "content": content,
+            "blog_id": blog,
+            "author": author,
+            "parent_id": parent,
+            "like": like,
+            "dislike": dislike,
+            "replies": [],
+            "replies_cursor": encode_thread_cursor(id_, 0) if truncated else None,
+        }
+        nodes[id_] = node
+        if level == 0:
+            roots.append(node)
+        else:
+            nodes[parent]["replies"].append(node)
+
+    return roots, next_cursor
@@ -0,0 +1,114 @@
+import os
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections
+
+STATS_KEY_PREFIX = "db_pool:stats"
+
+_publish_lock = threading.Lock()
+_last_published = time.monotonic()
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def ratio(numerator, denominator):
+    return numerator / denominator if denominator else 0.0
+
+
+def pool_snapshot(alias="default"):
+    """
+    This process's pool state plus its counters since the previous snapshot.
+
+    Counters are popped, so every snapshot covers one publishing window.
+    Returns None when the database is not pooled.
+    """
+    pool = connections[alias].pool
+    if pool is None:
+        return None
+    stats = pool.pop_stats()
+    size, available, max_size = stats.get("pool_size", 0), stats.get("pool_available", 0), stats.get("pool_max", 0)
+    requests = stats.get("requests_num", 0)
+    opened = stats.get("connections_num", 0)
+    return {
+        "worker": worker_name(),
+        "min_size": stats.get("pool_min", 0),
+        "max_size": max_size,
+        "size": size,
+        "in_use": size - available,
+        "utilization": ratio(size - available, max_size),
+        "waiting": stats.get("requests_waiting", 0),
+        "requests": requests,
+        # Requests that found no idle connection and had to queue for one
+        "queued": stats.get("requests_queued", 0),
+        "wait_ms_total": stats.get("requests_wait_ms", 0),
+        "wait_ms_avg": ratio(stats.get("requests_wait_ms", 0), requests),
+        "timeouts": stats.get("requests_errors", 0),
+        "usage_ms_avg": ratio(stats.get("usage_ms", 0), requests),
+        "connections_opened": opened,
+        "connect_ms_avg": ratio(stats.get("connections_ms", 0), opened),
+        "connection_errors": stats.get("connections_errors", 0),
+        "connections_lost": stats.get("connections_lost", 0),
+        "updated_at": time.time(),
+    }
+
+
+def publish_pool_stats(force=False):
+    """Store this worker's snapshot in Redis, at most once per ``DB_POOL_STATS_INTERVAL``."""
+    global _last_published
+    interval = settings.DB_POOL_STATS_INTERVAL
+    with _publish_lock:
+        now = time.monotonic()
+        if not force and now - _last_published < interval:
+            return
+        window = now - _last_published
+        _last_published = now
+
+    snapshot = pool_snapshot()
+    if snapshot is None:
+        return
+    snapshot["window_seconds"] = window
+    # Entries of workers that stopped reporting expire on their own
+    cache.set(f"{STATS_KEY_PREFIX}:{snapshot['worker']}", snapshot, timeout=interval * 3)
+
+
+def postgres_max_connections():
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW max_connections")
+        return int(cursor.fetchone()[0])
+
+
+def db_pool_stats():
+    """Latest snapshot from every live worker, plus totals to compare against ``max_connections``."""
+    if not settings.DB_POOL:
+        return {"pooled": False, "max_connections": postgres_max_connections()}
+
+    workers = sorted(
+        cache.get_many(list(cache.iter_keys(f"{STATS_KEY_PREFIX}:*"))).values(),
+        key=lambda snapshot: snapshot["worker"],
+    )
+    requests = sum(w["requests"] for w in workers)
+    max_size = sum(w["max_size"] for w in workers)
+    in_use = sum(w["in_use"] for w in workers)
+    return {
+        "pooled": True,
+        "max_connections": postgres_max_connections(),
+        "totals": {
+            "workers": len(workers),
+            "max_size": max_size,
+            "size": sum(w["size"] for w in workers),
+            "in_use": in_use,
+            "utilization": ratio(in_use, max_size),
+            "waiting": sum(w["waiting"] for w in workers),
+            "requests": requests,
+            "queued": sum(w["queued"] for w in workers),
+            "wait_ms_avg": ratio(sum(w["wait_ms_total"] for w in workers), requests),
+            "timeouts": sum(w["timeouts"] for w in workers),
+        },
+        "workers": workers,
+    }
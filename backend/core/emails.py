@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import EmailDedupe, OutgoingEmail
+
+
+def claim_dedupe_key(key):
+    """
+    Claim ``key`` for ``EMAIL_DEDUPE_WINDOW`` seconds; False while an earlier claim is live.
+
+    The claim row is locked, so a concurrent claim waits for this transaction
+    and then sees it, and a rollback leaves the key free.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=settings.EMAIL_DEDUPE_WINDOW)
+    claim, created = EmailDedupe.objects.select_for_update().get_or_create(
+        key=key, defaults={"expires_at": expires_at}
+    )
+    if created:
+        return True
+    if claim.expires_at > now:
+        return False
+    claim.expires_at = expires_at
+    claim.save(update_fields=["expires_at"])
+    return True
+
+
+def queue_email(subject, message, recipient_list, from_email=None, dedupe_key=None):
+    """
+    Queue a message for the ``send_queued_emails`` worker instead of talking SMTP in the request.
+
+    With ``dedupe_key``, repeats inside ``EMAIL_DEDUPE_WINDOW`` seconds are
+    dropped. Returns False when the message was deduplicated.
+    """
+    with transaction.atomic():
+        if dedupe_key and not claim_dedupe_key(dedupe_key):
+            return False
+        OutgoingEmail.objects.create(
+            subject=subject,
+            body=message,
+            from_email=from_email or "",
+            recipients=list(recipient_list),
+        )
+    return True
@@ -0,0 +1,211 @@
+import base64
+import binascii
+import hashlib
+import tempfile
+from functools import wraps
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db import transaction
+from easy_thumbnails.files import get_thumbnailer
+from ninja.errors import HttpError
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from core.background import submit_after_commit
+from core.cache import bump_listing_generation
+from core.models import Blog, MongoOutbox, User
+
+ALLOWED_FORMATS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+
+# Multiple of 4 so every slice of the payload decodes on its own
+DECODE_CHUNK = 64 * 1024
+SPOOL_SIZE = 1024 * 1024
+# Room for the multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD = 16 * 1024
+
+
+class ImageRejected(ValueError):
+    pass
+
+
+def decode_data_uri(data_uri, max_bytes):
+    """
+    Decode a ``data:image/...;base64,`` URI into a spooled temp file, chunk by chunk.
+
+    The decoded size is known from the encoded length, so oversized payloads are
+    rejected before any decoding happens and at most one chunk is held in memory.
+    """
+    header, sep, _ = data_uri[:128].partition(";base64,")
+    if not sep or not header.startswith("data:image/"):
+        raise ImageRejected("Invalid image format")
+    start = len(header) + len(sep)
+    if (len(data_uri) - start) * 3 // 4 > max_bytes + 2:
+        raise ImageRejected("Image is too large")
+
+    decoded = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    try:
+        for offset in range(start, len(data_uri), DECODE_CHUNK):
+            decoded.write(base64.b64decode(data_uri[offset:offset + DECODE_CHUNK], validate=True))
+    except binascii.Error:
+        decoded.close()
+        raise ImageRejected("Invalid image format")
+    decoded.seek(0)
+    return decoded
+
+
+def validate_image(fileobj):
+    """Check format and dimensions from the image header; returns the file extension to use."""
+    max_side = settings.PROFILE_IMAGE_MAX_DIMENSION
+    try:
+        with Image.open(fileobj) as image:
+            if image.format not in ALLOWED_FORMATS:
+                raise ImageRejected("Unsupported image format")
+            width, height = image.size
+            if width > max_side or height > max_side:
+                raise ImageRejected(f"Image dimensions must not exceed {max_side}x{max_side}")
+            image.verify()
+            ext = ALLOWED_FORMATS[image.format]
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ImageRejected("Invalid image format")
+    fileobj.seek(0)
+    return ext
+
+
+class SizeCappedUploadHandler(FileUploadHandler):
+    """
+    Abort a multipart upload as soon as it exceeds ``max_bytes``.
+
+    Runs ahead of Django's own handlers and passes every chunk through, so an
+    oversized request is rejected from ``Content-Length`` before parsing and
+    a lying client is cut off mid-stream instead of being spooled to disk.
+    """
+
+    def __init__(self, max_bytes, request=None):
+        super().__init__(request)
+        self.max_bytes = max_bytes
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > self.max_bytes + MULTIPART_OVERHEAD:
+            raise HttpError(413, "Image is too large")
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_bytes:
+            raise HttpError(413, "Image is too large")
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+def cap_profile_image_upload(run):
+    """``decorate_view`` hook: install the size cap before Ninja parses the body."""
+    @wraps(run)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers.insert(0, SizeCappedUploadHandler(settings.PROFILE_IMAGE_MAX_BYTES, request))
+        return run(request, *args, **kwargs)
+    return wrapper
+
+
+def set_profile_image(user, fileobj):
+    """
+    Validate and attach an uploaded image; returns the name of the image it replaces.
+
+    Pass that to ``schedule_avatars`` once the user is saved.
+    """
+    ext = validate_image(fileobj)
+    replaced = user.profile_image.name if user.profile_image else None
+    user.profile_image.save(f"profile.{ext}", File(fileobj), save=False)
+    return replaced
+
+
+def schedule_avatars(user, replaced=None):
+    submit_after_commit(generate_avatars, user.pk, replaced)
+
+
+def avatar_dir(user_id):
+    return f"profiles/avatars/{user_id}"
+
+
+def generate_avatars(user_id, replaced=None):
+    """
+    Render ``AVATAR_SIZES`` square WebP avatars and store their URLs in ``User.avatars``.
+
+    Every source image gets new file names, so a cached avatar never outlives
+    its picture. Only the task for the user's current image keeps its files:
+    it then deletes the replaced source and every older avatar.
+    """
+    user = User.objects.filter(pk=user_id).only("id", "profile_image").first()
+    if user is None or not user.profile_image:
+        return
+    source = user.profile_image.name
+    token = hashlib.sha256(source.encode()).hexdigest()[:12]
+
+    names, avatars = [], {}
+    with user.profile_image.open("rb") as image_file, Image.open(image_file) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        for size in settings.AVATAR_SIZES:
+            buffer = BytesIO()
+            ImageOps.fit(image, (size, size), Image.LANCZOS).save(buffer, "WEBP", quality=85)
+            name = default_storage.save(f"{avatar_dir(user_id)}/{size}-{token}.webp", ContentFile(buffer.getvalue()))
+            names.append(name)
+            avatars[str(size)] = default_storage.url(name)
+
+    with transaction.atomic():
+        current = User.objects.filter(pk=user_id, profile_image=source).update(avatars=avatars)
+        if current:
+            # update() sends no post_save: queue the read-model document by hand
+            MongoOutbox.objects.create(collection="users", object_id=user_id)
+
+    if not current:
+        # Replaced while rendering; the task for the new image cleans up
+        stale = names
+    else:
+        _, files = default_storage.listdir(avatar_dir(user_id))
+        stale = [f"{avatar_dir(user_id)}/{file}" for file in files if f"{avatar_dir(user_id)}/{file}" not in names]
+        if replaced and replaced != source:
+            stale.append(replaced)
+    for name in stale:
+        default_storage.delete(name)
+
+
+def file_sha256(field_file):
+    digest = hashlib.sha256()
+    with field_file.open("rb") as source:
+        for chunk in source.chunks():
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def generate_blog_image_variants(blog_id):
+    """
+    Render every width/format of ``Blog.main_image`` and store their URLs.
+
+    Skipped when the source content hash matches the one the current variants
+    were built from, so re-saving a blog never re-renders its images.
+    """
+    blog = Blog.objects.filter(pk=blog_id).only("id", "main_image", "main_image_hash", "image_variants").first()
+    if blog is None or not blog.main_image:
+        return
+
+    content_hash = file_sha256(blog.main_image)
+    if content_hash == blog.main_image_hash and blog.image_variants:
+        return
+
+    variants = {}
+    for name, ext in settings.BLOG_IMAGE_FORMATS.items():
+        thumbnailer = get_thumbnailer(blog.main_image)
+        thumbnailer.thumbnail_extension = ext
+        variants[name] = {
+            str(width): thumbnailer.get_thumbnail({"size": (width, 0)}).url
+            for width in settings.BLOG_IMAGE_WIDTHS
+        }
+
+    with transaction.atomic():
+        Blog.objects.filter(pk=blog_id).update(main_image_hash=content_hash, image_variants=variants)
+        # update() sends no post_save: queue the read-model document by hand
+        MongoOutbox.objects.create(collection="blogs", object_id=blog_id)
+    bump_listing_generation()
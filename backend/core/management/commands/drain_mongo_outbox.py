@@ -0,0 +1,138 @@
+import logging
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from pymongo import DeleteMany, ReplaceOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from core.background import retry_backoff
+from core.cache import bump_listing_generation
+from core.models import MongoOutbox
+from core.mongo import get_mongo_db
+from core.read_model import ensure_indexes
+from core.signals import MONGO_COLLECTIONS
+
+logger = logging.getLogger(__name__)
+
+# Failed writes after which a row is dead-lettered instead of retried
+MAX_ATTEMPTS = 10
+
+
+def build_requests(collection, object_ids):
+    """
+    Replace the documents of rows that still exist in Postgres and delete the rest.
+
+    Returns the requests and, for each request, the object ids it writes.
+    """
+    queryset, serialize = MONGO_COLLECTIONS[collection]
+    requests, request_ids = [], []
+    found = set()
+    for obj in queryset.filter(id__in=object_ids):
+        found.add(obj.id)
+        # Whole-document replace: fields dropped from the serializer go away too
+        requests.append(ReplaceOne({"id": obj.id}, serialize(obj), upsert=True))
+        request_ids.append({obj.id})
+    deleted = object_ids - found
+    if deleted:
+        requests.append(DeleteMany({"id": {"$in": list(deleted)}}))
+        request_ids.append(deleted)
+    return requests, request_ids
+
+
+def write_collection(collection, object_ids):
+    """Mirror one collection's changed ids; returns the ids whose writes failed."""
+    requests, request_ids = build_requests(collection, object_ids)
+    try:
+        get_mongo_db()[collection].bulk_write(requests, ordered=False)
+    except BulkWriteError as exc:
+        if exc.details.get("writeConcernErrors"):
+            return object_ids
+        # Unordered: every write but the rejected ones went through
+        return set().union(*(request_ids[error["index"]] for error in exc.details["writeErrors"]))
+    except PyMongoError:
+        return object_ids
+    return set()
+
+
+def drain_batch(batch_size):
+    """Mirror one batch of outbox rows to Mongo. Returns (rows processed, rows failed)."""
+    with transaction.atomic():
+        rows = list(
+            MongoOutbox.objects.select_for_update(skip_locked=True)
+            .filter(available_at__lte=timezone.now(), dead_at__isnull=True)
+            .order_by("id")[:batch_size]
+        )
+        if not rows:
+            return 0, 0
+
+        # Many outbox rows for the same document collapse into one write
+        pending = defaultdict(list)
+        for row in rows:
+            pending[row.collection].append(row)
+
+        done, failed = [], []
+        for collection, collection_rows in pending.items():
+            failed_ids = write_collection(collection, {row.object_id for row in collection_rows})
+            for row in collection_rows:
+                (failed if row.object_id in failed_ids else done).append(row)
+
+        MongoOutbox.objects.filter(id__in=[row.id for row in done]).delete()
+        if settings.BLOG_READ_MODEL == "mongo" and any(row.collection == "blogs" for row in done):
+            # Listings cached between the Postgres commit and this write hold the old documents
+            transaction.on_commit(bump_listing_generation)
+
+        now = timezone.now()
+        for row in failed:
+            row.attempts += 1
+            row.available_at = now + retry_backoff(row.attempts)
+            if row.attempts >= MAX_ATTEMPTS:
+                row.dead_at = now
+                logger.error("Dead-lettered Mongo outbox row %s (%s) after %d failed writes", row.id, row, row.attempts)
+        MongoOutbox.objects.bulk_update(failed, ["attempts", "available_at", "dead_at"])
+
+    return len(rows), len(failed)
+
+
+def requeue_dead_rows():
+    return MongoOutbox.objects.filter(dead_at__isnull=False).update(
+        dead_at=None, attempts=0, available_at=timezone.now()
+    )
+
+
+class Command(BaseCommand):
+    help = "Drain the Mongo outbox: coalesce pending changes and mirror them with bulk_write."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--idle-sleep", type=float, default=1.0, help="Seconds to wait when the outbox is empty.")
+        parser.add_argument("--until-empty", action="store_true", help="Exit once nothing is due and report throughput.")
+        parser.add_argument("--requeue-dead", action="store_true",
+                            help=f"Retry the rows dead-lettered after {MAX_ATTEMPTS} failed writes, then drain.")
+
+    def handle(self, *args, **options):
+        if options["requeue_dead"]:
+            self.stdout.write(f"Requeued {requeue_dead_rows()} dead-lettered rows")
+
+        for collection in MONGO_COLLECTIONS:
+            ensure_indexes(collection)
+
+        started = time.monotonic()
+        processed = failed = 0
+        while True:
+            batch, batch_failed = drain_batch(options["batch_size"])
+            processed += batch
+            failed += batch_failed
+            if batch == batch_failed:
+                if options["until_empty"]:
+                    break
+                time.sleep(options["idle_sleep"])
+
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {processed} outbox rows ({failed} failed) in {elapsed:.2f}s, {rate:.0f} rows/s"
+        ))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.votes import flush_votes
+
+
+class Command(BaseCommand):
+    help = "Periodically apply buffered comment votes from Redis to Postgres."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between flushes.")
+        parser.add_argument("--once", action="store_true", help="Flush a single batch and exit.")
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = flush_votes()
+            if options["once"]:
+                self.stdout.write(self.style.SUCCESS(f"Flushed votes for {flushed} comments"))
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,56 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.models import Blog
+from core.uploads import BLOB_NAME_RE, BLOB_URL_RE, UPLOADS_DIR
+
+
+class Command(BaseCommand):
+    help = "Delete content-addressed TinyMCE uploads that no Blog.description references any more."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-age", type=float, default=24,
+                            help="Hours a blob must be untouched before it can be collected (covers unsaved drafts).")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        referenced = set()
+        descriptions = Blog.objects.values_list("description", flat=True).iterator(chunk_size=2000)
+        for description in descriptions:
+            referenced.update(BLOB_URL_RE.findall(description))
+
+        cutoff = time.time() - options["min_age"] * 3600
+        root = os.path.join(settings.MEDIA_ROOT, UPLOADS_DIR)
+        scanned = deleted = freed = 0
+        # Only the two shard levels are walked; legacy flat uploads are left alone
+        for shard in self.subdirs(root):
+            for subshard in self.subdirs(shard):
+                with os.scandir(subshard) as entries:
+                    for entry in entries:
+                        if not entry.is_file() or not BLOB_NAME_RE.match(entry.name):
+                            continue
+                        scanned += 1
+                        stat = entry.stat()
+                        if entry.name[:64] in referenced or stat.st_mtime > cutoff:
+                            continue
+                        if not options["dry_run"]:
+                            # store_blob may have just reused it; re-check right before unlinking
+                            if os.stat(entry.path).st_mtime > cutoff:
+                                continue
+                            os.unlink(entry.path)
+                        deleted += 1
+                        freed += stat.st_size
+
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {scanned} blobs, {len(referenced)} referenced. {verb} {deleted} ({freed / 1024 / 1024:.1f} MiB)"
+        ))
+
+    def subdirs(self, path):
+        if not os.path.isdir(path):
+            return []
+        with os.scandir(path) as entries:
+            return [entry.path for entry in entries if entry.is_dir() and len(entry.name) == 2]
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from core.models import Blog
+from core.search import blog_search_vector
+
+
+class Command(BaseCommand):
+    help = "Recompute Blog.search_vector in id-ordered batches (backfill after deploy or bulk imports)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_id = 0
+        total = 0
+        while True:
+            ids = list(
+                Blog.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            total += Blog.objects.filter(id__in=ids).update(search_vector=blog_search_vector())
+            last_id = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f"Updated search vectors for {total} blogs"))
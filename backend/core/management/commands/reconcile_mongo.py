@@ -0,0 +1,110 @@
+import hashlib
+import json
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from pymongo import DeleteMany, ReplaceOne
+
+from core.mongo import get_mongo_db
+from core.read_model import ensure_indexes
+from core.signals import MONGO_COLLECTIONS
+
+# Collections that can be narrowed with --since, and the column that tracks changes
+SINCE_FIELDS = {
+    "blogs": "updated_at",
+    "comments": "updated_at",
+}
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def checksum(docs):
+    digest = hashlib.sha1()
+    for doc in docs:
+        digest.update(json.dumps(doc, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild or verify the blog_sync Mongo collections from Postgres. Rows are streamed "
+        "through a server-side cursor and written with unordered bulk_write batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("collections", nargs="*", help=f"Subset of: {', '.join(MONGO_COLLECTIONS)}")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument("--verify", action="store_true",
+                            help="Compare per-chunk checksums and only rewrite chunks that differ.")
+        parser.add_argument("--since", help="Only rows changed at or after this ISO datetime (blogs, comments).")
+
+    def handle(self, *args, **options):
+        collections = options["collections"] or list(MONGO_COLLECTIONS)
+        unknown = set(collections) - set(MONGO_COLLECTIONS)
+        if unknown:
+            raise CommandError(f"Unknown collections: {', '.join(sorted(unknown))}")
+
+        since = None
+        if options["since"]:
+            since = parse_datetime(options["since"])
+            if since is None:
+                raise CommandError("--since must be an ISO 8601 datetime")
+
+        for collection in collections:
+            if since and collection not in SINCE_FIELDS:
+                self.stdout.write(f"{collection}: no change timestamp, skipped in --since mode")
+                continue
+            stats = self.reconcile(collection, options["chunk_size"], options["verify"], since)
+            self.stdout.write(self.style.SUCCESS(
+                f"{collection}: {stats['rows']} rows, {stats['chunks']} chunks, "
+                f"{stats['rewritten']} rewritten, {stats['deleted']} orphans deleted"
+            ))
+
+    def reconcile(self, collection, chunk_size, verify, since):
+        queryset, serialize = MONGO_COLLECTIONS[collection]
+        if since:
+            queryset = queryset.filter(**{f"{SINCE_FIELDS[collection]}__gte": since})
+        target = get_mongo_db()[collection]
+        ensure_indexes(collection)
+
+        stats = {"rows": 0, "chunks": 0, "rewritten": 0, "deleted": 0}
+        previous_id = None
+        rows = queryset.order_by("id").iterator(chunk_size=chunk_size)
+        for chunk in chunked(rows, chunk_size):
+            docs = [serialize(obj) for obj in chunk]
+            ids = [doc["id"] for doc in docs]
+            stats["rows"] += len(docs)
+            stats["chunks"] += 1
+
+            # A full pass owns the whole id range since the previous chunk, so
+            # Mongo documents inside it that Postgres no longer has are orphans
+            if since:
+                mongo_filter = {"id": {"$in": ids}}
+            else:
+                mongo_filter = {"id": {"$lte": ids[-1]}}
+                if previous_id is not None:
+                    mongo_filter["id"]["$gt"] = previous_id
+            previous_id = ids[-1]
+
+            if verify:
+                existing = list(target.find(mongo_filter, {"_id": 0}).sort("id", 1))
+                if checksum(existing) == checksum(docs):
+                    continue
+
+            # Replace rather than $set, so fields no longer serialized are removed from drifted documents
+            requests = [ReplaceOne({"id": doc["id"]}, doc, upsert=True) for doc in docs]
+            if not since:
+                requests.append(DeleteMany({**mongo_filter, "id": {**mongo_filter["id"], "$nin": ids}}))
+            result = target.bulk_write(requests, ordered=False)
+            stats["rewritten"] += len(docs)
+            stats["deleted"] += result.deleted_count
+
+        if not since:
+            tail = {"id": {"$gt": previous_id}} if previous_id is not None else {}
+            stats["deleted"] += target.delete_many(tail).deleted_count
+        return stats
@@ -0,0 +1,286 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+from django.utils import timezone
+
+from core.cache import bump_listing_generation
+from core.models import Blog, Category, Comment, Menu, Tag, User
+from core.search import blog_search_vector
+from core.signals import invalidate_reference_groups
+from core.thread_locals import set_bulk_operation_flag
+
+WORDS = (
+    "python django postgres redis mongo async cache index query latency throughput "
+    "pagination search thread comment category tag menu release deploy worker pool "
+    "profile image upload token session schema migration replica shard cluster "
+    "benchmark backend frontend review design pattern testing monitoring metrics"
+).split()
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def reserve_ids(model, count):
+    """Claim ``count`` consecutive ids from the table's sequence and return the first one."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [model._meta.db_table])
+        sequence = cursor.fetchone()[0]
+        cursor.execute("SELECT setval(%s, nextval(%s) + %s - 1)", [sequence, sequence, count])
+        return cursor.fetchone()[0] - count + 1
+
+
+@contextmanager
+def explicit_timestamps(model):
+    # bulk_create runs pre_save, which would overwrite the generated dates with now()
+    fields = [f for f in model._meta.concrete_fields if getattr(f, "auto_now", False) or getattr(f, "auto_now_add", False)]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Skewed:
+    """Zipf-like picker: the item at popularity rank r is chosen with weight 1 / r ** skew."""
+
+    def __init__(self, rng, population, skew):
+        self.rng = rng
+        self.population = list(population)
+        # Popularity is unrelated to id order
+        rng.shuffle(self.population)
+        self.cum_weights = list(accumulate(1 / rank ** skew for rank in range(1, len(self.population) + 1)))
+
+    def pick(self, k=1):
+        return self.rng.choices(self.population, cum_weights=self.cum_weights, k=k)
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a deterministic synthetic dataset: users, category trees, tags, menus, "
+        "blogs with tags and deep comment threads. Rows are written with batched bulk_create or COPY "
+        "while model receivers are silenced; search vectors and caches are refreshed once at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--categories", type=int, default=200)
+        parser.add_argument("--category-roots", type=int, default=10)
+        parser.add_argument("--category-depth", type=int, default=6, help="Maximum category tree depth")
+        parser.add_argument("--tags", type=int, default=500)
+        parser.add_argument("--menus", type=int, default=20)
+        parser.add_argument("--blogs", type=int, default=100_000)
+        parser.add_argument("--tags-per-blog", type=int, default=5, help="Upper bound; each blog gets 0..N")
+        parser.add_argument("--inactive-ratio", type=float, default=0.05)
+        parser.add_argument("--days", type=int, default=730, help="Blog creation dates spread over this many days")
+        parser.add_argument("--comments", type=int, default=1_000_000)
+        parser.add_argument("--reply-ratio", type=float, default=0.7, help="Share of comments that are replies")
+        parser.add_argument("--comment-depth", type=int, default=8, help="Maximum reply nesting")
+        parser.add_argument("--skew", type=float, default=1.1,
+                            help="Popularity skew for authors, categories, tags, commented blogs and threads")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--prefix", default="seed", help="Username prefix, to seed more than once")
+        parser.add_argument("--password", default="seed", help="Password of every generated user")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--copy", action="store_true", help="Load rows with Postgres COPY instead of bulk_create")
+        parser.add_argument("--mongo", action="store_true", help="Mirror everything to Mongo at the end")
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username=f"{options['prefix']}_0").exists():
+            raise CommandError(f"Users with prefix {options['prefix']!r} already exist; pass another --prefix")
+        if options["copy"] and not is_psycopg3:
+            raise CommandError("--copy needs psycopg 3")
+
+        self.options = options
+        self.rng = random.Random(options["seed"])
+        self.now = timezone.now()
+        started = time.monotonic()
+
+        set_bulk_operation_flag(True)
+        try:
+            user_ids = self.seed_users()
+            category_ids = self.seed_categories()
+            tag_ids = self.seed_tags()
+            self.seed_menus(category_ids)
+            blog_ids = self.seed_blogs(user_ids, category_ids, tag_ids)
+            self.seed_comments(blog_ids, user_ids)
+        finally:
+            set_bulk_operation_flag(False)
+
+        bump_listing_generation()
+        for model in (Category, Tag, Menu):
+            invalidate_reference_groups(model)
+        if options["mongo"]:
+            call_command("reconcile_mongo", stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(f"Seeded in {time.monotonic() - started:.1f}s"))
+
+    def insert(self, label, model, objects):
+        """Write an iterable of unsaved instances (ids already assigned) and report the rate."""
+        started = time.monotonic()
+        count = 0
+        with explicit_timestamps(model):
+            if self.options["copy"]:
+                # The proxy resolves the connection on every attribute access; skip that per value
+                db = connections[DEFAULT_DB_ALIAS]
+                fields = model._meta.concrete_fields
+                columns = ", ".join(connection.ops.quote_name(f.column) for f in fields)
+                sql = f"COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) FROM STDIN"
+                with connection.cursor() as cursor, cursor.copy(sql) as copy:
+                    for obj in objects:
+                        copy.write_row([f.get_db_prep_save(getattr(obj, f.attname), db) for f in fields])
+                        count += 1
+            else:
+                for batch in chunked(objects, self.options["batch_size"]):
+                    model.objects.bulk_create(batch)
+                    count += len(batch)
+        elapsed = time.monotonic() - started
+        self.stdout.write(f"{label}: {count} rows in {elapsed:.1f}s ({count / max(elapsed, 1e-6):.0f} rows/s)")
+        return count
+
+    def sentence(self, words):
+        return " ".join(self.rng.choices(WORDS, k=words)).capitalize()
+
+    def ids(self, model, count):
+        first = reserve_ids(model, count) if count else 0
+        return range(first, first + count)
+
+    def seed_users(self):
+        count, prefix = self.options["users"], self.options["prefix"]
+        ids = self.ids(User, count)
+        password = make_password(self.options["password"])
+        self.insert("users", User, (
+            User(id=user_id, username=f"{prefix}_{i}", email=f"{prefix}_{i}@example.com", password=password,
+                 first_name=self.rng.choice(WORDS).title(), date_joined=self.now - timedelta(days=self.options["days"]))
+            for i, user_id in enumerate(ids)
+        ))
+        return ids
+
+    def seed_categories(self):
+        count = self.options["categories"]
+        roots = min(self.options["category_roots"], count)
+        max_level = self.options["category_depth"] - 1
+        ids = self.ids(Category, count)
+
+        # Each category hangs under an earlier one that still has room below it:
+        # half the time the newest such category (long chains), otherwise any of them
+        levels, open_parents, categories = {}, [], []
+        for i, category_id in enumerate(ids):
+            parent_id = None
+            if i >= roots and open_parents:
+                parent_id = open_parents[-1] if self.rng.random() < 0.5 else self.rng.choice(open_parents)
+            levels[category_id] = levels[parent_id] + 1 if parent_id else 0
+            if levels[category_id] < max_level:
+                open_parents.append(category_id)
+            categories.append(Category(id=category_id, title=self.sentence(2), parent_id=parent_id,
+                                       lft=0, rght=0, tree_id=0, level=0))
+        self.insert("categories", Category, categories)
+        Category.objects.rebuild()
+        return ids
+
+    def seed_tags(self):
+        ids = self.ids(Tag, self.options["tags"])
+        self.insert("tags", Tag, (Tag(id=tag_id, title=f"{self.rng.choice(WORDS)}-{i}") for i, tag_id in enumerate(ids)))
+        return ids
+
+    def seed_menus(self, category_ids):
+        ids = self.ids(Menu, self.options["menus"])
+        self.insert("menus", Menu, (
+            Menu(id=menu_id, title=self.sentence(2), order=i,
+                 category_id=self.rng.choice(category_ids) if category_ids else None)
+            for i, menu_id in enumerate(ids)
+        ))
+
+    def seed_blogs(self, user_ids, category_ids, tag_ids):
+        count = self.options["blogs"]
+        ids = self.ids(Blog, count)
+        authors = Skewed(self.rng, user_ids, self.options["skew"])
+        categories = Skewed(self.rng, category_ids, self.options["skew"]) if category_ids else None
+        start = self.now - timedelta(days=self.options["days"])
+        step = timedelta(days=self.options["days"]) / max(count, 1)
+
+        def blogs():
+            for i, blog_id in enumerate(ids):
+                created_at = start + step * i
+                yield Blog(
+                    id=blog_id,
+                    title=self.sentence(self.rng.randint(3, 9)),
+                    description="".join(f"<p>{self.sentence(self.rng.randint(20, 60))}</p>" for _ in range(self.rng.randint(1, 4))),
+                    author_id=authors.pick()[0],
+                    category_id=categories.pick()[0] if categories else None,
+                    created_at=created_at,
+                    updated_at=created_at,
+                    is_active=self.rng.random() >= self.options["inactive_ratio"],
+                )
+
+        self.insert("blogs", Blog, blogs())
+        for batch in chunked(ids, self.options["batch_size"]):
+            Blog.objects.filter(id__range=(batch[0], batch[-1])).update(search_vector=blog_search_vector())
+
+        if tag_ids and self.options["tags_per_blog"]:
+            tags = Skewed(self.rng, tag_ids, self.options["skew"])
+            pairs = [
+                (blog_id, tag_id)
+                for blog_id in ids
+                for tag_id in sorted(set(tags.pick(self.rng.randint(0, self.options["tags_per_blog"]))))
+            ]
+            through = Blog.tags.through
+            self.insert("blog tags", through, (
+                through(id=pk, blog_id=blog_id, tag_id=tag_id)
+                for pk, (blog_id, tag_id) in zip(self.ids(through, len(pairs)), pairs)
+            ))
+        return ids
+
+    def seed_comments(self, blog_ids, user_ids):
+        total = self.options["comments"]
+        if not total or not blog_ids:
+            return
+        depth = self.options["comment_depth"]
+        roots = max(1, round(total * (1 - self.options["reply_ratio"])))
+        # Replies thin out geometrically with depth
+        weights = [0.5 ** level for level in range(depth)]
+        replies = [round((total - roots) * w / sum(weights)) for w in weights] if depth else []
+
+        authors = Skewed(self.rng, user_ids, self.options["skew"])
+        blogs = Skewed(self.rng, blog_ids, self.options["skew"])
+        # (comment id, blog id) pairs of the previous level, the parents of the next one
+        level = list(zip(self.ids(Comment, roots), blogs.pick(roots)))
+        self.insert("comments (roots)", Comment, (
+            self.comment(comment_id, blog_id, None, authors) for comment_id, blog_id in level
+        ))
+
+        for nesting, count in enumerate(replies, start=1):
+            if not count or not level:
+                break
+            # Popular comments attract most replies, so a few threads run deep
+            parents = Skewed(self.rng, level, self.options["skew"]).pick(count)
+            level = [(comment_id, parent[1]) for comment_id, parent in zip(self.ids(Comment, count), parents)]
+            self.insert(f"comments (depth {nesting})", Comment, (
+                self.comment(comment_id, blog_id, parent[0], authors)
+                for (comment_id, blog_id), parent in zip(level, parents)
+            ))
+
+    def comment(self, comment_id, blog_id, parent_id, authors):
+        return Comment(
+            id=comment_id,
+            blog_id=blog_id,
+            parent_id=parent_id,
+            author_id=authors.pick()[0],
+            content=self.sentence(self.rng.randint(5, 40)),
+            like=int(self.rng.paretovariate(1.5)) - 1,
+            dislike=int(self.rng.paretovariate(2.5)) - 1,
+            updated_at=self.now,
+        )
@@ -0,0 +1,109 @@
+import logging
+import smtplib
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.background import retry_backoff
+from core.models import EmailDedupe, OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+# Delivery attempts after which a message is dead-lettered instead of retried
+MAX_ATTEMPTS = 8
+
+CONNECTION_ERRORS = (smtplib.SMTPException, OSError)
+
+
+def send_batch(batch_size):
+    """Deliver one batch over a single SMTP connection. Returns (sent, failed)."""
+    with transaction.atomic():
+        emails = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(available_at__lte=timezone.now(), dead_at__isnull=True)
+            .order_by("id")[:batch_size]
+        )
+        if not emails:
+            return 0, 0
+
+        sent, retry, dropped = [], [], []
+        connection = get_connection()
+        try:
+            connection.open()
+        except CONNECTION_ERRORS:
+            retry = emails
+        else:
+            try:
+                for email in emails:
+                    message = EmailMessage(
+                        subject=email.subject,
+                        body=email.body,
+                        from_email=email.from_email or settings.DEFAULT_FROM_EMAIL,
+                        to=email.recipients,
+                        connection=connection,
+                    )
+                    try:
+                        connection.send_messages([message])
+                        sent.append(email)
+                    except smtplib.SMTPRecipientsRefused:
+                        dropped.append(email)
+                    except smtplib.SMTPResponseException as exc:
+                        # 4xx is the relay asking us to come back later; 5xx will never succeed
+                        (dropped if exc.smtp_code >= 500 else retry).append(email)
+                    except CONNECTION_ERRORS:
+                        retry.append(email)
+            finally:
+                connection.close()
+
+        OutgoingEmail.objects.filter(id__in=[email.id for email in sent + dropped]).delete()
+
+        now = timezone.now()
+        for email in retry:
+            email.attempts += 1
+            email.available_at = now + retry_backoff(email.attempts)
+            if email.attempts >= MAX_ATTEMPTS:
+                email.dead_at = now
+                logger.error("Dead-lettered email %s (%s) after %d failed attempts", email.id, email, email.attempts)
+        OutgoingEmail.objects.bulk_update(retry, ["attempts", "available_at", "dead_at"])
+
+    return len(sent), len(retry) + len(dropped)
+
+
+def requeue_dead_emails():
+    return OutgoingEmail.objects.filter(dead_at__isnull=False).update(
+        dead_at=None, attempts=0, available_at=timezone.now()
+    )
+
+
+def purge_expired_dedupe_claims():
+    return EmailDedupe.objects.filter(expires_at__lte=timezone.now()).delete()[0]
+
+
+class Command(BaseCommand):
+    help = "Deliver queued OutgoingEmail rows, reusing one SMTP connection per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--idle-sleep", type=float, default=1.0)
+        parser.add_argument("--until-empty", action="store_true")
+        parser.add_argument("--requeue-dead", action="store_true",
+                            help=f"Retry the emails dead-lettered after {MAX_ATTEMPTS} failed attempts, then send.")
+
+    def handle(self, *args, **options):
+        if options["requeue_dead"]:
+            self.stdout.write(f"Requeued {requeue_dead_emails()} dead-lettered emails")
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_batch(options["batch_size"])
+            total_sent += sent
+            total_failed += failed
+            if not sent:
+                purge_expired_dedupe_claims()
+                if options["until_empty"]:
+                    break
+                time.sleep(options["idle_sleep"])
+        self.stdout.write(self.style.SUCCESS(f"Sent {total_sent} emails, {total_failed} failed"))
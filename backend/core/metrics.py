@@ -0,0 +1,146 @@
+import hmac
+import os
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, multiprocess
+from pymongo import monitoring
+
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, 233)
+
+REQUEST_DURATION = Histogram(
+    "api_request_duration_seconds", "Time spent in Django per request", ["route", "method"]
+)
+REQUESTS = Counter("api_requests_total", "Requests by response status", ["route", "method", "status"])
+DB_QUERIES = Histogram(
+    "api_request_db_queries", "SQL queries per request", ["route"], buckets=QUERY_BUCKETS
+)
+DB_DURATION = Histogram("api_request_db_seconds", "SQL time per request", ["route"])
+MONGO_DURATION = Histogram("api_request_mongo_seconds", "Mongo command time per request", ["route"])
+CACHE_LOOKUPS = Counter("api_cache_lookups_total", "Application cache lookups", ["route", "cache", "result"])
+
+_current = ContextVar("request_metrics", default=None)
+# (route, method) -> labeled histograms; resolving labels on every request costs more than observing
+_route_histograms = {}
+
+
+class RequestMetrics:
+    __slots__ = ("started", "db_queries", "db_time", "mongo_commands", "mongo_time", "cache")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.mongo_commands = 0
+        self.mongo_time = 0.0
+        # (cache, "hit" | "miss") -> count
+        self.cache = {}
+
+
+def start_request():
+    """Begin collecting for the current request; returns the token for ``end_request``."""
+    return _current.set(RequestMetrics())
+
+
+def end_request(request, response, token):
+    """Stop collecting, observe the request's histograms and add the ``Server-Timing`` header."""
+    metrics = _current.get()
+    _current.reset(token)
+    elapsed = time.perf_counter() - metrics.started
+
+    match = request.resolver_match
+    route = match.route if match is not None else "unmatched"
+    histograms = _route_histograms.get((route, request.method))
+    if histograms is None:
+        histograms = _route_histograms[route, request.method] = (
+            REQUEST_DURATION.labels(route, request.method),
+            DB_QUERIES.labels(route),
+            DB_DURATION.labels(route),
+            MONGO_DURATION.labels(route),
+        )
+    duration, db_queries, db_duration, mongo_duration = histograms
+    duration.observe(elapsed)
+    db_queries.observe(metrics.db_queries)
+    db_duration.observe(metrics.db_time)
+    if metrics.mongo_commands:
+        mongo_duration.observe(metrics.mongo_time)
+    REQUESTS.labels(route, request.method, response.status_code).inc()
+    for (name, result), count in metrics.cache.items():
+        CACHE_LOOKUPS.labels(route, name, result).inc(count)
+
+    if settings.METRICS_SERVER_TIMING:
+        response["Server-Timing"] = server_timing(metrics, elapsed)
+    return response
+
+
+def server_timing(metrics, elapsed):
+    entries = [f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.db_queries} queries"']
+    if metrics.mongo_commands:
+        entries.append(f'mongo;dur={metrics.mongo_time * 1000:.1f};desc="{metrics.mongo_commands} commands"')
+    if metrics.cache:
+        hits = sum(count for (_, result), count in metrics.cache.items() if result == "hit")
+        misses = sum(metrics.cache.values()) - hits
+        entries.append(f'cache;desc="{hits} hits, {misses} misses"')
+    entries.append(f"app;dur={elapsed * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def record_cache(name, hit):
+    metrics = _current.get()
+    if metrics is not None:
+        key = (name, "hit" if hit else "miss")
+        metrics.cache[key] = metrics.cache.get(key, 0) + 1
+
+
+def sql_timer(execute, sql, params, many, context):
+    """``connection.execute_wrapper`` that adds every query to the current request."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def instrument_connection(connection):
+    # First in the list: Django's own execute_wrapper() context manager pops the last one
+    if sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, sql_timer)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Adds pymongo command durations to the current request."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.record(event.duration_micros)
+
+    def failed(self, event):
+        self.record(event.duration_micros)
+
+    def record(self, duration_micros):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.mongo_commands += 1
+            metrics.mongo_time += duration_micros / 1_000_000
+
+
+def metrics_registry():
+    # Under gunicorn every worker writes its samples to PROMETHEUS_MULTIPROC_DIR
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def metrics_token_matches(request):
+    token = settings.METRICS_TOKEN
+    scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+    return bool(token) and scheme.lower() == "bearer" and hmac.compare_digest(credentials, token)
@@ -1,15 +1,28 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.conf import settings
+from django.utils import timezone
+from mptt.models import MPTTModel, TreeForeignKey
 
 
 class User(AbstractUser):
     profile_image = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    # Filled in the background from profile_image: {size: url}
+    avatars = models.JSONField(default=dict, blank=True, editable=False)
+    # Part of every JWT; bumping it (password change or reset) revokes older tokens
+    token_version = models.PositiveIntegerField(default=0, editable=False)
 
 
-class Category(models.Model):
+class Category(MPTTModel):
     title = models.CharField(max_length=255)
-    parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='children')
+    parent = TreeForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='children')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['tree_id', 'lft'], name='category_tree_lft_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -25,12 +38,27 @@ class Tag(models.Model):
 class Blog(models.Model):
     title = models.CharField(max_length=255)
     main_image = models.ImageField(upload_to='blog_images/')
+    # Filled in the background from main_image: sha256 of the source and {format: {width: url}}
+    main_image_hash = models.CharField(max_length=64, blank=True, editable=False)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     description = models.TextField()
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
     tags = models.ManyToManyField(Tag, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     is_active = models.BooleanField(default=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='blog_search_vector_gin'),
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=models.Q(is_active=True),
+                name='blog_active_created_id_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -53,6 +81,100 @@ class Comment(models.Model):
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
     like = models.PositiveIntegerField(default=0)
     dislike = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['parent', 'id'], name='comment_parent_id_idx'),
+            models.Index(
+                fields=['blog', 'id'],
+                condition=models.Q(parent__isnull=True),
+                name='comment_blog_root_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Comment by {self.author} on {self.blog}"
+
+
+class AppliedVoteBatch(models.Model):
+    """
+    Vote batches already added to ``Comment.like``/``dislike``.
+
+    Inserted in the same transaction as the counter updates, so a batch that
+    is flushed again (after a crash, or by a second flusher) is skipped.
+    """
+    batch_id = models.CharField(max_length=32, unique=True)
+    applied_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.batch_id
+
+
+class MongoOutbox(models.Model):
+    """
+    Pending Mongo mirror updates, written in the same transaction as the change.
+
+    Rows only record *which* document changed; the drain worker reads the
+    current Postgres state when it runs, so repeated saves coalesce and a
+    rolled-back write never reaches Mongo.
+    """
+    collection = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    # Set once the row ran out of attempts; the drain skips it until it is requeued
+    dead_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['available_at', 'id'],
+                condition=models.Q(dead_at__isnull=True),
+                name='mongo_outbox_available_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.collection}:{self.object_id}"
+
+
+
+class OutgoingEmail(models.Model):
+    """Mail queued by request handlers and delivered by the ``send_queued_emails`` worker."""
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    recipients = models.JSONField(default=list)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    # Set once delivery ran out of attempts; the worker skips it until it is requeued
+    dead_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['available_at', 'id'],
+                condition=models.Q(dead_at__isnull=True),
+                name='outgoing_email_available_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)}"
+
+
+class EmailDedupe(models.Model):
+    """
+    Claims on a ``queue_email`` dedupe key, taken in the caller's transaction.
+
+    A rolled-back request releases its claim with it. Expired rows are reused
+    by the next claim and purged by ``send_queued_emails``.
+    """
+    key = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
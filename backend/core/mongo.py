@@ -0,0 +1,67 @@
+import os
+import threading
+
+from django.conf import settings
+from pymongo import MongoClient
+
+from core.metrics import MongoCommandTimer
+
+_lock = threading.Lock()
+_client = None
+
+
+def write_concern():
+    w = settings.MONGO_WRITE_CONCERN
+    return int(w) if w.isdigit() else w
+
+
+def get_mongo_client():
+    """
+    This process's ``MongoClient``, created on first use.
+
+    Nothing connects at import time, and a forked child never reuses the
+    parent's client (pymongo clients are not fork-safe); it builds its own.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = MongoClient(
+                    settings.MONGO_URL,
+                    maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+                    minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+                    connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+                    serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                    socketTimeoutMS=settings.MONGO_SOCKET_TIMEOUT_MS,
+                    w=write_concern(),
+                    wTimeoutMS=settings.MONGO_WRITE_TIMEOUT_MS,
+                    event_listeners=[MongoCommandTimer()],
+                    # Dates come back as aware UTC datetimes, like the ORM's
+                    tz_aware=True,
+                    # Defer the topology threads to the first operation
+                    connect=False,
+                )
+    return _client
+
+
+def get_mongo_db():
+    return get_mongo_client()[settings.MONGO_DB_NAME]
+
+
+def close_mongo_client():
+    global _client
+    with _lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+
+def _reset_after_fork():
+    # The inherited client's sockets and monitor threads belong to the parent:
+    # drop it without closing, and replace a lock another thread may have held
+    global _client, _lock
+    _client = None
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,155 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional
+
+from django.db.models import Q
+from ninja import Field, Schema
+from ninja.conf import settings as ninja_settings
+from ninja.errors import HttpError
+from ninja.pagination import AsyncPaginationBase, PageNumberPagination
+
+MAX_PAGE_SIZE = 100
+
+
+def encode_payload(payload):
+    data = json.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_payload(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode()))
+
+
+def encode_cursor(value, pk, direction):
+    return encode_payload({"v": value.isoformat(), "i": pk, "d": direction})
+
+
+def decode_cursor(cursor):
+    try:
+        payload = decode_payload(cursor)
+        direction = payload["d"]
+        if direction not in ("next", "prev"):
+            raise ValueError(direction)
+        return datetime.fromisoformat(payload["v"]), int(payload["i"]), direction
+    except (ValueError, KeyError, TypeError):
+        raise HttpError(400, "Invalid cursor")
+
+
+class CursorPagination(AsyncPaginationBase):
+    """
+    Keyset pagination over ``(<field>, id)``, newest first.
+
+    Pages are located with a ``WHERE (field, id) < (...)`` seek instead of an
+    OFFSET and no ``COUNT(*)`` is issued, so the cost of a page does not depend
+    on how deep it is.
+    """
+
+    class Input(Schema):
+        cursor: Optional[str] = Field(None, description="Opaque cursor from a previous response")
+        page_size: Optional[int] = Field(None, ge=1)
+
+    class Output(Schema):
+        items: List[Any]
+        next: Optional[str]
+        prev: Optional[str]
+
+    def __init__(
+        self,
+        *,
+        field: str = "created_at",
+        serializer: Optional[Callable] = None,
+        page_size: int = ninja_settings.PAGINATION_PER_PAGE,
+        max_page_size: int = MAX_PAGE_SIZE,
+        **kwargs,
+    ):
+        self.field = field
+        self.serializer = serializer
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        super().__init__(**kwargs)
+
+    def seek(self, queryset, pagination: Input):
+        size = min(pagination.page_size or self.page_size, self.max_page_size)
+        field = self.field
+
+        if pagination.cursor:
+            value, pk, direction = decode_cursor(pagination.cursor)
+        else:
+            value, pk, direction = None, None, "next"
+
+        if direction == "next":
+            if value is not None:
+                queryset = queryset.filter(Q(**{f"{field}__lt": value}) | Q(**{field: value, "id__lt": pk}))
+            queryset = queryset.order_by(f"-{field}", "-id")
+        else:
+            queryset = queryset.filter(Q(**{f"{field}__gt": value}) | Q(**{field: value, "id__gt": pk}))
+            queryset = queryset.order_by(field, "id")
+        return queryset[:size + 1], size, value, direction
+
+    def build_page(self, rows, size, value, direction):
+        has_more = len(rows) > size
+        rows = rows[:size]
+        if direction == "prev":
+            rows.reverse()
+
+        next_cursor = prev_cursor = None
+        if rows:
+            first, last = rows[0], rows[-1]
+            if direction == "next":
+                more_after, more_before = has_more, value is not None
+            else:
+                more_after, more_before = True, has_more
+            if more_after:
+                next_cursor = encode_cursor(getattr(last, self.field), last.id, "next")
+            if more_before:
+                prev_cursor = encode_cursor(getattr(first, self.field), first.id, "prev")
+
+        items = [self.serializer(row) for row in rows] if self.serializer else rows
+        return {"items": items, "next": next_cursor, "prev": prev_cursor}
+
+    def paginate_queryset(self, queryset, pagination: Input, **params):
+        queryset, size, value, direction = self.seek(queryset, pagination)
+        return self.build_page(list(queryset), size, value, direction)
+
+    async def apaginate_queryset(self, queryset, pagination: Input, **params):
+        queryset, size, value, direction = self.seek(queryset, pagination)
+        return self.build_page([row async for row in queryset], size, value, direction)
+
+
+class SerializedPageNumberPagination(PageNumberPagination):
+    """
+    ``PageNumberPagination`` that serializes only the rows of the current page.
+
+    ``rows`` maps the queryset to what the page is read from, e.g. a
+    ``values_list()`` projection; the count still runs on the plain queryset,
+    without the projection's joins. The async variant evaluates the page itself: Ninja would otherwise iterate
+    the lazy slice synchronously, which the ORM refuses inside an event loop.
+    """
+
+    def __init__(self, *, serializer: Optional[Callable] = None, rows: Optional[Callable] = None, **kwargs):
+        self.serializer = serializer
+        self.rows = rows
+        super().__init__(**kwargs)
+
+    def serialize(self, rows):
+        return [self.serializer(row) for row in rows] if self.serializer else rows
+
+    def page(self, queryset, pagination):
+        offset = (pagination.page - 1) * self.page_size
+        if self.rows:
+            queryset = self.rows(queryset)
+        return queryset[offset:offset + self.page_size]
+
+    def paginate_queryset(self, queryset, pagination: PageNumberPagination.Input, **params):
+        return {
+            "items": self.serialize(self.page(queryset, pagination)),
+            "count": self._items_count(queryset),
+        }
+
+    async def apaginate_queryset(self, queryset, pagination: PageNumberPagination.Input, **params):
+        return {
+            "items": self.serialize([row async for row in self.page(queryset, pagination)]),
+            "count": await self._aitems_count(queryset),
+        }
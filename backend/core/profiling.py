@@ -0,0 +1,254 @@
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.authentication import get_user_for_token
+
+REPORT_KEY_PREFIX = "profiling:report"
+PROFILE_HEADER = "X-Profile"
+MAX_QUERIES = 200
+SQL_STACK_DEPTH = 6
+HOT_PATHS = 15
+
+PROJECT_DIR = os.path.join(settings.BASE_DIR, "backend") + os.sep
+# Frames on every profiled stack, never the answer to "where did the time go"
+WRAPPER_FILES = {"manage.py", "core/middleware.py", "core/metrics.py", "core/profiling.py"}
+
+_current = ContextVar("request_profile", default=None)
+
+
+def project_path(filename):
+    """``filename`` relative to ``backend/`` when it is project code outside the wrappers, else None."""
+    if not filename.startswith(PROJECT_DIR) or "site-packages" in filename:
+        return None
+    path = filename[len(PROJECT_DIR):]
+    return None if path in WRAPPER_FILES else path
+
+
+def frame_label(code):
+    filename = code.co_filename
+    if filename.startswith(PROJECT_DIR):
+        filename = filename[len(PROJECT_DIR):]
+    elif "site-packages" in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples the stacks of a set of threads every ``interval`` seconds.
+
+    The sampler needs the GIL to take a sample, so CPU-bound Python code is
+    seen at the interpreter's switch interval (5 ms) at best.
+    """
+
+    def __init__(self, interval, thread_ids):
+        super().__init__(name="request-profiler", daemon=True)
+        self.interval = interval
+        self.thread_ids = set(thread_ids)
+        self.stacks = Counter()
+        self.project_frames = set()
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in tuple(self.thread_ids):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.stacks[self.collapse(frame)] += 1
+
+    def collapse(self, frame):
+        """One stack as a ``root;...;leaf`` line of the collapsed-stacks format."""
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            label = frame_label(code)
+            if project_path(code.co_filename):
+                self.project_frames.add(label)
+            labels.append(label)
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+    def stop(self):
+        self.done.set()
+        self.join()
+
+
+class RequestProfile:
+    def __init__(self, trigger):
+        self.id = uuid.uuid4().hex
+        self.trigger = trigger
+        self.queries = []
+        self.query_count = 0
+        self.started = time.perf_counter()
+        self.sampler = StackSampler(settings.PROFILE_INTERVAL_MS / 1000, [threading.get_ident()])
+        self.sampler.start()
+
+    def record_query(self, sql, duration, stack):
+        self.query_count += 1
+        if len(self.queries) < MAX_QUERIES:
+            self.queries.append({"sql": sql, "duration_ms": duration * 1000, "stack": stack})
+
+    def finish(self, request, response):
+        duration = time.perf_counter() - self.started
+        self.sampler.stop()
+        stacks = self.sampler.stacks
+        match = request.resolver_match
+        return {
+            "id": self.id,
+            "created_at": time.time(),
+            "trigger": self.trigger,
+            "method": request.method,
+            "path": request.get_full_path(),
+            "route": match.route if match is not None else None,
+            "status": response.status_code,
+            "duration_ms": duration * 1000,
+            "interval_ms": settings.PROFILE_INTERVAL_MS,
+            "samples": sum(stacks.values()),
+            "hot_paths": hot_paths(stacks, self.sampler.project_frames),
+            "query_count": self.query_count,
+            "query_ms": sum(query["duration_ms"] for query in self.queries),
+            "queries": self.queries,
+            "collapsed": "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()),
+        }
+
+
+def hot_paths(stacks, project_frames):
+    """
+    Project functions ranked by the share of samples where they were the
+    innermost project frame ("self": the time spent in them and the library
+    code they called), with the share of samples they were on the stack at all.
+    """
+    total, own = Counter(), Counter()
+    for stack, count in stacks.items():
+        project = [label for label in stack.split(";") if label in project_frames]
+        for label in set(project):
+            total[label] += count
+        if project:
+            own[project[-1]] += count
+    samples = sum(stacks.values()) or 1
+    return [
+        {"function": label, "self": count / samples, "total": total[label] / samples}
+        for label, count in own.most_common(HOT_PATHS)
+    ]
+
+
+def sql_origin():
+    """The innermost project frames that led to a query, innermost last."""
+    origin = []
+    frame = sys._getframe(2)
+    while frame is not None and len(origin) < SQL_STACK_DEPTH:
+        path = project_path(frame.f_code.co_filename)
+        if path:
+            origin.append(f"{path}:{frame.f_lineno} in {frame.f_code.co_name}")
+        frame = frame.f_back
+    return origin[::-1]
+
+
+def sql_recorder(execute, sql, params, many, context):
+    """``connection.execute_wrapper`` that captures queries of a profiled request."""
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    # Async views run their ORM calls in worker threads: sample those too
+    profile.sampler.thread_ids.add(threading.get_ident())
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.record_query(sql, time.perf_counter() - started, sql_origin())
+
+
+def instrument_connection(connection):
+    if sql_recorder not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, sql_recorder)
+
+
+def sampled():
+    rate = settings.PROFILE_SAMPLE_RATE
+    return bool(rate) and random.random() * rate < 1
+
+
+def requested_by_staff(request, user):
+    """Whether the request comes from a staff user, signed in by session or JWT."""
+    if user is None or not user.is_staff:
+        user = bearer_user(request)
+    return user is not None and user.is_staff
+
+
+def bearer_user(request):
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return get_user_for_token(token)
+
+
+def start_profile(trigger):
+    profile = RequestProfile(trigger)
+    return profile, _current.set(profile)
+
+
+def finish_profile(request, response, profile, token):
+    _current.reset(token)
+    report = profile.finish(request, response)
+    response["X-Profile-Id"] = profile.id
+    return report
+
+
+def save_report(report):
+    cache.set(f"{REPORT_KEY_PREFIX}:{report['id']}", report, timeout=settings.PROFILE_REPORT_TTL)
+
+
+def get_report(report_id):
+    return cache.get(f"{REPORT_KEY_PREFIX}:{report_id}")
+
+
+def list_reports():
+    """Summaries of the stored reports, newest first."""
+    reports = cache.get_many(list(cache.iter_keys(f"{REPORT_KEY_PREFIX}:*"))).values()
+    summaries = [
+        {key: value for key, value in report.items() if key not in ("queries", "collapsed")}
+        for report in reports
+    ]
+    return sorted(summaries, key=lambda report: report["created_at"], reverse=True)
+
+
+def speedscope(report):
+    """A stored report as a speedscope "sampled" profile."""
+    frames, index, samples, weights = [], {}, [], []
+    for line in report["collapsed"].splitlines():
+        stack, _, count = line.rpartition(" ")
+        sample = []
+        for label in stack.split(";"):
+            if label not in index:
+                index[label] = len(frames)
+                frames.append({"name": label})
+            sample.append(index[label])
+        samples.append(sample)
+        weights.append(int(count) * report["interval_ms"])
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": f"{report['method']} {report['path']}",
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+        "name": report["id"],
+        "exporter": "blog-app",
+    }
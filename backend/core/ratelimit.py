@@ -0,0 +1,117 @@
+import hashlib
+import logging
+import math
+from functools import wraps
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Token buckets for every key of a request, checked and consumed in one call.
+# Nothing is consumed unless every bucket has a token; the reply is the
+# number of milliseconds to wait (0 when allowed). Time comes from the Redis
+# server so workers with skewed clocks share one view of the buckets.
+TOKEN_BUCKET_SCRIPT = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local tokens = {}
+local wait = 0
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local window_ms = tonumber(ARGV[2 * i])
+    local rate = capacity / window_ms
+    local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local available = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now_ms
+    available = math.min(capacity, available + (now_ms - ts) * rate)
+    tokens[i] = available
+    if available < 1 then
+        wait = math.max(wait, math.ceil((1 - available) / rate))
+    end
+end
+if wait > 0 then
+    return wait
+end
+for i = 1, #KEYS do
+    redis.call('HSET', KEYS[i], 'tokens', tostring(tokens[i] - 1), 'ts', now_ms)
+    redis.call('PEXPIRE', KEYS[i], ARGV[2 * i])
+end
+return 0
+"""
+
+_script = None
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"Rate limited, retry after {retry_after}s")
+
+
+def get_script():
+    global _script
+    if _script is None:
+        _script = get_redis_connection("default").register_script(TOKEN_BUCKET_SCRIPT)
+    return _script
+
+
+def parse_rate(rate):
+    """``"5/m"`` -> ``(5, 60000)``: capacity and refill window in milliseconds."""
+    count, unit = rate.split("/")
+    return int(count), UNITS[unit] * 1000
+
+
+def client_ip(request):
+    if settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+        forwarded = request.META.get("HTTP_X_FORWARDED_FOR")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def key_value(kind, request, kwargs):
+    if kind == "ip":
+        return client_ip(request)
+    # Any other kind names a view argument, either top level or on the request body schema
+    value = kwargs.get(kind)
+    if value is None and "data" in kwargs:
+        value = getattr(kwargs["data"], kind, None)
+    return str(value).strip().lower() if value is not None else None
+
+
+def check_rate_limit(scope, request, kwargs):
+    keys, args = [], []
+    for kind, rate in settings.RATE_LIMITS.get(scope, {}).items():
+        value = key_value(kind, request, kwargs)
+        if not value:
+            continue
+        digest = hashlib.sha1(value.encode()).hexdigest()
+        capacity, window_ms = parse_rate(rate)
+        keys.append(f"ratelimit:{scope}:{kind}:{digest}")
+        args.extend([capacity, window_ms])
+    if not keys:
+        return
+
+    try:
+        wait_ms = get_script()(keys=keys, args=args)
+    except RedisError:
+        # Fail open: an unavailable limiter must not take the auth endpoints down with it
+        logger.warning("Rate limiter unavailable for %s", scope, exc_info=True)
+        return
+    if wait_ms:
+        raise RateLimited(math.ceil(wait_ms / 1000))
+
+
+def rate_limited(scope):
+    """Apply the ``settings.RATE_LIMITS[scope]`` buckets to a Ninja view."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            check_rate_limit(scope, request, kwargs)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
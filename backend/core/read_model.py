@@ -0,0 +1,120 @@
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from ninja.errors import HttpError
+from pymongo import ASCENDING, DESCENDING
+
+from core.mongo import get_mongo_db
+
+# Listing order; every index below ends with it so pages are read in index order
+NEWEST_FIRST = [("created_at", DESCENDING), ("id", DESCENDING)]
+
+# Mongo collection -> compound indexes besides the unique "id" one
+MONGO_INDEXES = {
+    "blogs": [
+        [("is_active", ASCENDING)] + NEWEST_FIRST,
+        [("is_active", ASCENDING), ("category_id", ASCENDING)] + NEWEST_FIRST,
+        [("is_active", ASCENDING), ("category_path", ASCENDING)] + NEWEST_FIRST,
+        [("is_active", ASCENDING), ("tag_ids", ASCENDING)] + NEWEST_FIRST,
+        [("is_active", ASCENDING), ("author_key", ASCENDING)] + NEWEST_FIRST,
+    ],
+}
+
+# Document fields in ``blog_rows`` column order
+ROW_FIELDS = (
+    "id", "title", "description", "category", "tags", "created_at",
+    "is_active", "author", "main_image", "image_variants",
+)
+
+
+def ensure_indexes(collection):
+    target = get_mongo_db()[collection]
+    target.create_index("id", unique=True)
+    for keys in MONGO_INDEXES.get(collection, []):
+        target.create_index(keys)
+
+
+def reads_from_mongo(filters):
+    # Full-text search and relevance ranking stay on Postgres
+    return settings.BLOG_READ_MODEL == "mongo" and not filters.q
+
+
+def start_of_day(value, days=0):
+    """Midnight ``days`` after the ``YYYY-MM-DD`` date ``value``, in the current time zone like ``__date`` lookups."""
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise HttpError(400, "Invalid date")
+    return timezone.make_aware(datetime.combine(day + timedelta(days=days), time.min))
+
+
+def blog_query(filters):
+    """The Mongo filter matching ``filter_blogs`` for everything but ``q``."""
+    query = {"is_active": True}
+    if filters.author:
+        query["author_key"] = filters.author.lower()
+    if filters.category:
+        query["category_path" if filters.include_descendants else "category_id"] = filters.category
+    if filters.tag:
+        query["tag_ids"] = filters.tag
+    if filters.date_from or filters.date_to:
+        query["created_at"] = {}
+        if filters.date_from:
+            query["created_at"]["$gte"] = start_of_day(filters.date_from)
+        if filters.date_to:
+            query["created_at"]["$lt"] = start_of_day(filters.date_to, days=1)
+    return query
+
+
+class BlogDocuments:
+    """
+    Active blogs matching ``BlogFilters`` in the Mongo read model, newest first.
+
+    Stands in for the queryset the page paginators take: ``count()``,
+    ``acount()`` and slicing, where a slice iterates (sync or async) over
+    tuples shaped like ``blog_rows``.
+    """
+
+    def __init__(self, query, offset=0, limit=None):
+        self.query = query
+        self.offset = offset
+        self.limit = limit
+
+    @classmethod
+    def matching(cls, filters):
+        return cls(blog_query(filters))
+
+    def all(self):
+        return self
+
+    def count(self):
+        return get_mongo_db()["blogs"].count_documents(self.query)
+
+    async def acount(self):
+        return await sync_to_async(self.count, thread_sensitive=False)()
+
+    def __getitem__(self, page):
+        return BlogDocuments(self.query, self.offset + (page.start or 0), page.stop - (page.start or 0))
+
+    def fetch(self):
+        cursor = (
+            get_mongo_db()["blogs"]
+            .find(self.query, {field: 1 for field in ROW_FIELDS} | {"_id": 0})
+            .sort(NEWEST_FIRST)
+            .skip(self.offset)
+        )
+        if self.limit is not None:
+            cursor = cursor.limit(self.limit)
+        return [tuple(doc.get(field) for field in ROW_FIELDS) for doc in cursor]
+
+    def __iter__(self):
+        return iter(self.fetch())
+
+    async def __aiter__(self):
+        for row in await sync_to_async(self.fetch, thread_sensitive=False)():
+            yield row
@@ -0,0 +1,31 @@
+import orjson
+from django.http import HttpResponse
+from ninja.renderers import BaseRenderer
+from ninja.responses import NinjaJSONEncoder
+
+JSON_CONTENT_TYPE = "application/json; charset=utf-8"
+
+_encoder = NinjaJSONEncoder()
+
+
+def dumps(data):
+    """
+    JSON bytes through orjson.
+
+    Datetimes and anything orjson does not know (Pydantic models, Decimal,
+    lazy strings) fall back to Ninja's encoder, so the output matches the
+    stdlib renderer's formats.
+    """
+    return orjson.dumps(data, default=_encoder.default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+def json_response(data, status=200):
+    """An already rendered response; Ninja returns it without validating it against the schema again."""
+    return HttpResponse(dumps(data), content_type=JSON_CONTENT_TYPE, status=status)
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = "application/json"
+
+    def render(self, request, data, *, response_status):
+        return dumps(data)
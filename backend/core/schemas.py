@@ -1,7 +1,7 @@
-from typing import List
-from ninja import Schema
+from typing import List, Dict
+from ninja import Field, Schema
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Literal
 from pydantic import EmailStr
 
 
@@ -25,6 +25,29 @@ class CommentOut(Schema):
     dislike: int
 
 
+class CommentNode(CommentOut):
+    replies: List["CommentNode"] = []
+    # Set when more replies exist than were returned; pass it back as ``cursor``
+    replies_cursor: Optional[str] = None
+
+
+CommentNode.model_rebuild()
+
+
+class CommentThreadOut(Schema):
+    items: List[CommentNode]
+    next: Optional[str]
+
+
+class VoteIn(Schema):
+    value: Literal["like", "dislike"]
+
+
+class VoteOut(Schema):
+    like: int
+    dislike: int
+
+
 class CommentEdit(Schema):
     content: str
 
@@ -46,6 +69,22 @@ class BlogOut(Schema):
     created_at: datetime
     is_active: bool
     author: str
+    main_image: Optional[str] = None
+    # {"webp": {"320": url, "640": url, ...}, "jpeg": {...}}, empty until rendered
+    image_variants: Dict[str, Dict[str, str]] = {}
+
+
+class BlogFilters(Schema):
+    q: Optional[str] = None
+    author: Optional[str] = None
+    category: Optional[int] = None
+    tag: Optional[int] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    sort: Optional[Literal["relevance"]] = Field(
+        None, description="`relevance` ranks `q` matches; ignored by /blogs/feed, which is always newest first"
+    )
+    include_descendants: bool = False
 
 
 class CategoryOut(Schema):
@@ -54,6 +93,13 @@ class CategoryOut(Schema):
     parent_id: Optional[int]
 
 
+class CategoryNode(CategoryOut):
+    children: List["CategoryNode"] = []
+
+
+CategoryNode.model_rebuild()
+
+
 class TagOut(Schema):
     id: int
     title: str
@@ -67,6 +113,15 @@ class MenuOut(Schema):
     url: Optional[str]
 
 
+class ProfileOut(Schema):
+    username: str
+    email: str
+    first_name: str
+    last_name: str
+    profile_image: Optional[str]
+    avatars: Dict[str, str]
+
+
 class ProfileUpdateSchema(Schema):
     first_name: Optional[str] = None
     last_name: Optional[str] = None
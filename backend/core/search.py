@@ -0,0 +1,29 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, Func, TextField, Value
+
+SEARCH_CONFIG = "english"
+
+
+class StripTags(Func):
+    """Drop TinyMCE markup in Postgres so tags and attributes are not indexed."""
+    function = "regexp_replace"
+    output_field = TextField()
+
+    def __init__(self, expression, **extra):
+        super().__init__(expression, Value("<[^>]*>"), Value(" "), Value("g"), **extra)
+
+
+def blog_search_vector():
+    # Title matches outrank body matches
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector(StripTags("description"), weight="B", config=SEARCH_CONFIG)
+    )
+
+
+def search_blogs(queryset, q, rank=False):
+    query = SearchQuery(q, search_type="websearch", config=SEARCH_CONFIG)
+    queryset = queryset.filter(search_vector=query)
+    if rank:
+        queryset = queryset.annotate(rank=SearchRank(F("search_vector"), query)).order_by("-rank", "-id")
+    return queryset
@@ -1,19 +1,27 @@
-from django.db.models.signals import post_save, post_delete
-from core.models import Blog, Category, Tag, Menu, Comment, User
-from pymongo import MongoClient
+from django.contrib.postgres.expressions import ArraySubquery
 from django.conf import settings
-from core.thread_locals import get_admin_request_flag
-from django.contrib.auth.models import Permission
+from django.db import connection, transaction
+from django.utils import timezone
+from django.db.models import OuterRef
+from django.db.models.signals import post_init, post_save, pre_delete, post_delete, m2m_changed
+from core.models import Blog, Category, Tag, Menu, Comment, User, MongoOutbox
+from core.thread_locals import get_admin_request_flag, get_bulk_operation_flag
+from django.contrib.auth.models import Permission, Group
 from django.contrib.contenttypes.models import ContentType
 from django.apps import apps
 from django.db.models.signals import post_migrate
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
 from django.dispatch import receiver
-
-# Setup Mongo connection
-mongo_client = MongoClient(settings.MONGO_URL)
-mongo_db = mongo_client[settings.MONGO_DB_NAME]
-mongo_collection = mongo_db["blogs"]
-
+from core.search import blog_search_vector
+from core.cache import bump_listing_generation, bump_reference_version
+from functools import partial
+from core.background import submit_after_commit
+from core.authentication import invalidate_user, invalidate_users, bump_permission_generation
+from core.images import generate_blog_image_variants
+from core.db_pool import publish_pool_stats
+from core.metrics import instrument_connection
+from core import profiling
 
 @receiver(post_migrate)
 def create_api_docs_permission(sender, **kwargs):
@@ -27,132 +35,353 @@ def create_api_docs_permission(sender, **kwargs):
     )
 
 
+@receiver(request_finished)
+def publish_db_pool_stats(sender, **kwargs):
+    publish_pool_stats()
+
+
+@receiver(connection_created)
+def time_sql_queries(sender, connection, **kwargs):
+    instrument_connection(connection)
+    profiling.instrument_connection(connection)
+
+
+@receiver([post_save, post_delete], sender=Blog)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Tag)
+@receiver(m2m_changed, sender=Blog.tags.through)
+def invalidate_listing_cache(sender, **kwargs):
+    if get_bulk_operation_flag():
+        # Bulk paths bump once per batch instead of once per row
+        return
+    # Bump after commit so a concurrent reader can't re-cache the pre-commit rows
+    transaction.on_commit(bump_listing_generation)
+
+
+@receiver(post_init, sender=User)
+def remember_loaded_user_fields(sender, instance, **kwargs):
+    # Compared on save instead of re-reading the row; __dict__ so deferred fields stay deferred
+    instance._loaded_token_version = instance.__dict__.get("token_version")
+    instance._loaded_username = instance.__dict__.get("username")
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Drop the entry for the version it was loaded with too, so a bump revokes it at once
+    versions = {instance._loaded_token_version, instance.__dict__.get("token_version")} - {None}
+    if versions:
+        transaction.on_commit(partial(invalidate_user, instance.pk, *versions))
+    else:
+        transaction.on_commit(partial(invalidate_users, [instance.pk]))
+    instance._loaded_token_version = instance.__dict__.get("token_version")
+
+
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_user_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        transaction.on_commit(partial(invalidate_users, [instance.pk]))
+    elif pk_set:
+        transaction.on_commit(partial(invalidate_users, list(pk_set)))
+    else:
+        # Reverse clear(): the affected users aren't listed
+        transaction.on_commit(bump_permission_generation)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver([post_save, post_delete], sender=Group)
+@receiver([post_save, post_delete], sender=Permission)
+def invalidate_permission_cache(sender, **kwargs):
+    if kwargs.get("action", "post_").startswith("post_"):
+        transaction.on_commit(bump_permission_generation)
+
+
+# Reference-data cache groups affected by a change to each model. Deleting a
+# category nulls Menu.category, so menus are invalidated along with it.
+REFERENCE_GROUPS = {
+    Category: ("categories", "menus"),
+    Tag: ("tags",),
+    Menu: ("menus",),
+}
+
+
+def invalidate_reference_groups(model):
+    for group in REFERENCE_GROUPS.get(model, ()):
+        transaction.on_commit(partial(bump_reference_version, group))
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Tag)
+@receiver([post_save, post_delete], sender=Menu)
+def invalidate_reference_cache(sender, **kwargs):
+    if not get_bulk_operation_flag():
+        invalidate_reference_groups(sender)
+
+
+def rebuild_category_tree():
+    Category.objects.rebuild()
+
+
+@receiver(post_delete, sender=Category)
+def repair_category_tree(sender, **kwargs):
+    # SET_NULL re-roots the children behind mptt's back; rebuild lft/rght once committed
+    if not get_bulk_operation_flag():
+        transaction.on_commit(rebuild_category_tree)
+
+
 def serialize_blog(blog):
+    """
+    The blog's read-model document: the ``BlogOut`` fields plus the ids the
+    listing filters on. Reads the annotations of ``MONGO_COLLECTIONS["blogs"]``.
+    """
     return {
         "id": blog.id,
         "title": blog.title,
         "description": blog.description,
-        "category": blog.category.title if blog.category else None,
-        "tags": [tag.title for tag in blog.tags.all()],
+        # Same as blog_row_out: BlogOut.category is a plain str
+        "category": blog.category.title if blog.category else "",
+        "category_id": blog.category_id,
+        # The category and its ancestors, for include_descendants filters
+        "category_path": blog.category_path,
+        "tags": blog.tag_titles,
+        "tag_ids": blog.tag_ids,
         "author": blog.author.username,
+        "author_id": blog.author_id,
+        "author_key": blog.author.username.lower(),
+        # BSON dates hold milliseconds; truncate so reconcile --verify checksums match
+        "created_at": blog.created_at.replace(microsecond=blog.created_at.microsecond // 1000 * 1000),
         "is_active": blog.is_active,
+        "main_image": blog.main_image.name or None,
+        "image_variants": blog.image_variants,
     }
 
-@receiver(post_save, sender=Blog)
-def sync_blog_to_mongo(sender, instance, **kwargs):
-    print('POST edit SIGNAL:')
-    # Only sync from Django admin
-    if hasattr(instance, "_from_admin") and instance._from_admin:
-        mongo_collection.update_one(
-            {"id": instance.id},
-            {"$set": serialize_blog(instance)},
-            upsert=True
+
+def serialize_category(category):
+    return {
+        "id": category.id,
+        "title": category.title,
+        "parent_id": category.parent_id,
+    }
+
+
+def serialize_tag(tag):
+    return {
+        "id": tag.id,
+        "title": tag.title,
+    }
+
+
+def serialize_menu(menu):
+    return {
+        "id": menu.id,
+        "title": menu.title,
+        "order": menu.order,
+        "category_id": menu.category_id,
+        "url": menu.url,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        "id": comment.id,
+        "blog_id": comment.blog_id,
+        "author_id": comment.author_id,
+        "content": comment.content,
+        "parent_id": comment.parent_id,
+        "like": comment.like,
+        "dislike": comment.dislike,
+    }
+
+
+def serialize_user(user):
+    return {
+        "id": user.id,
+        "username": user.username,
+        "email": user.email,
+        "is_staff": user.is_staff,
+        "is_active": user.is_active,
+        "profile_image": user.profile_image.url if user.profile_image else None,
+        "avatars": user.avatars,
+    }
+
+
+def blog_tags(column):
+    return ArraySubquery(
+        Blog.tags.through.objects.filter(blog_id=OuterRef("pk")).order_by("id").values(column)
+    )
+
+
+mongo_blogs = Blog.objects.select_related("category", "author").annotate(
+    category_path=ArraySubquery(
+        Category.objects.filter(
+            tree_id=OuterRef("category__tree_id"),
+            lft__lte=OuterRef("category__lft"),
+            rght__gte=OuterRef("category__rght"),
+        ).order_by("lft").values("id")
+    ),
+    tag_titles=blog_tags("tag__title"),
+    tag_ids=blog_tags("tag_id"),
+)
+
+# Mongo collection -> (queryset the current rows are read from, serializer)
+MONGO_COLLECTIONS = {
+    "blogs": (mongo_blogs, serialize_blog),
+    "categories": (Category.objects.all(), serialize_category),
+    "tags": (Tag.objects.all(), serialize_tag),
+    "menus": (Menu.objects.all(), serialize_menu),
+    "comments": (Comment.objects.all(), serialize_comment),
+    "users": (User.objects.all(), serialize_user),
+}
+
+
+def enqueue_mongo_sync(collection, object_id):
+    # Part of the caller's transaction: rolled back together with the change itself
+    MongoOutbox.objects.create(collection=collection, object_id=object_id)
+
+
+def enqueue_mongo_sync_many(collection, object_ids):
+    MongoOutbox.objects.bulk_create(
+        [MongoOutbox(collection=collection, object_id=object_id) for object_id in object_ids], batch_size=1000
+    )
+
+
+def enqueue_mongo_sync_select(collection, queryset):
+    """Queue every row of ``queryset`` with one ``INSERT ... SELECT``; the ids never reach Python."""
+    sql, params = queryset.values("id").query.sql_with_params()
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {MongoOutbox._meta.db_table} (collection, object_id, attempts, available_at, created_at) "
+            f"SELECT %s, id, 0, %s, %s FROM ({sql}) AS changed",
+            [collection, now, now, *params],
         )
 
+
+def blogs_depending_on(model, ids):
+    """Blogs whose read-model document embeds one of these categories, tags or users."""
+    if model is Category:
+        subtrees = Category.objects.get_queryset_descendants(Category.objects.filter(id__in=ids), include_self=True)
+        return Blog.objects.filter(category__in=subtrees)
+    if model is Tag:
+        return Blog.objects.filter(tags__in=ids).distinct()
+    if model is User:
+        return Blog.objects.filter(author__in=ids)
+    return Blog.objects.none()
+
+
+def enqueue_dependent_blogs(model, ids):
+    """
+    Queue every blog embedding these rows with one ``INSERT ... SELECT``, so
+    renaming a popular tag never reads its blog ids into Python.
+
+    Skipped unless listings read the Mongo documents: switching
+    ``BLOG_READ_MODEL`` to mongo starts from ``reconcile_mongo blogs``.
+    """
+    if settings.BLOG_READ_MODEL != "mongo":
+        return
+    enqueue_mongo_sync_select("blogs", blogs_depending_on(model, ids))
+
+
+@receiver(post_save, sender=Blog)
+def update_blog_search_vector(sender, instance, **kwargs):
+    # Recomputed in SQL so the stored vector always matches the saved row
+    Blog.objects.filter(pk=instance.pk).update(search_vector=blog_search_vector())
+
+@receiver(post_save, sender=Blog)
+def render_blog_image_variants(sender, instance, raw=False, **kwargs):
+    if instance.main_image and not raw:
+        submit_after_commit(generate_blog_image_variants, instance.pk)
+
+# The blogs collection is the listing's read model (BLOG_READ_MODEL), so every
+# write path feeds it, not only the admin. Bulk paths enqueue their own rows.
+
+@receiver(post_save, sender=Blog)
 @receiver(post_delete, sender=Blog)
-def delete_blog_from_mongo(sender, instance, **kwargs):
-    print(f"POST DELETE SIGNAL: blog {instance.id}, from_admin={get_admin_request_flag()}")
-    if get_admin_request_flag():
-        mongo_collection.delete_one({"id": instance.id})
+def sync_blog_to_mongo(sender, instance, **kwargs):
+    if not get_bulk_operation_flag():
+        enqueue_mongo_sync("blogs", instance.id)
+
+@receiver(m2m_changed, sender=Blog.tags.through)
+def sync_blog_tags_to_mongo(sender, instance, action, reverse, pk_set, **kwargs):
+    if get_bulk_operation_flag():
+        return
+    if not reverse:
+        if action.startswith("post_"):
+            enqueue_mongo_sync("blogs", instance.id)
+    elif action == "pre_clear":
+        # tag.blog_set.clear() lists no blogs; read them while the rows still exist
+        enqueue_dependent_blogs(Tag, [instance.pk])
+    elif action in ("post_add", "post_remove"):
+        enqueue_mongo_sync_many("blogs", pk_set)
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Tag)
+def sync_dependent_blogs_to_mongo(sender, instance, created=False, **kwargs):
+    # Titles and category paths are embedded in the blog documents; a new row has no blogs yet
+    if not created and not get_bulk_operation_flag():
+        enqueue_dependent_blogs(sender, [instance.pk])
+
+@receiver(post_save, sender=User)
+def sync_authored_blogs_to_mongo(sender, instance, created, **kwargs):
+    loaded, username = instance._loaded_username, instance.__dict__.get("username")
+    if not created and loaded is not None and username != loaded and not get_bulk_operation_flag():
+        enqueue_dependent_blogs(User, [instance.pk])
+    instance._loaded_username = username
 
 
 @receiver(post_save, sender=Category)
 def sync_category_to_mongo(sender, instance, **kwargs):
     if get_admin_request_flag():
-        mongo_db["categories"].update_one(
-            {"id": instance.id},
-            {"$set": {
-                "id": instance.id,
-                "title": instance.title,
-                "parent_id": instance.parent.id if instance.parent else None
-            }},
-            upsert=True
-        )
+        enqueue_mongo_sync("categories", instance.id)
 
 @receiver(post_delete, sender=Category)
 def delete_category_from_mongo(sender, instance, **kwargs):
     if get_admin_request_flag():
-        mongo_db["categories"].delete_one({"id": instance.id})
+        enqueue_mongo_sync("categories", instance.id)
 
 
 @receiver(post_save, sender=Tag)
 def sync_tag_to_mongo(sender, instance, **kwargs):
     if get_admin_request_flag():
-        mongo_db["tags"].update_one(
-            {"id": instance.id},
-            {"$set": {
-                "id": instance.id,
-                "title": instance.title
-            }},
-            upsert=True
-        )
+        enqueue_mongo_sync("tags", instance.id)
 
 @receiver(post_delete, sender=Tag)
 def delete_tag_from_mongo(sender, instance, **kwargs):
     if get_admin_request_flag():
-        mongo_db["tags"].delete_one({"id": instance.id})
+        enqueue_mongo_sync("tags", instance.id)
 
 
 @receiver(post_save, sender=Menu)
 def sync_menu_to_mongo(sender, instance, **kwargs):
     if get_admin_request_flag():
-        mongo_db["menus"].update_one(
-            {"id": instance.id},
-            {"$set": {
-                "id": instance.id,
-                "title": instance.title,
-                "order": instance.order,
-                "category_id": instance.category.id if instance.category else None,
-                "url": instance.url
-            }},
-            upsert=True
-        )
+        enqueue_mongo_sync("menus", instance.id)
 
 @receiver(post_delete, sender=Menu)
 def delete_menu_from_mongo(sender, instance, **kwargs):
     if get_admin_request_flag():
-        mongo_db["menus"].delete_one({"id": instance.id})
+        enqueue_mongo_sync("menus", instance.id)
 
 
 @receiver(post_save, sender=Comment)
 def sync_comment_to_mongo(sender, instance, **kwargs):
     if get_admin_request_flag():
-        mongo_db["comments"].update_one(
-            {"id": instance.id},
-            {"$set": {
-                "id": instance.id,
-                "blog_id": instance.blog.id,
-                "author_id": instance.author.id,
-                "content": instance.content,
-                "parent_id": instance.parent.id if instance.parent else None,
-                "like": instance.like,
-                "dislike": instance.dislike
-            }},
-            upsert=True
-        )
+        enqueue_mongo_sync("comments", instance.id)
 
 @receiver(post_delete, sender=Comment)
 def delete_comment_from_mongo(sender, instance, **kwargs):
     if get_admin_request_flag():
-        mongo_db["comments"].delete_one({"id": instance.id})
+        enqueue_mongo_sync("comments", instance.id)
 
 @receiver(post_save, sender=User)
 def sync_user_to_mongo(sender, instance, **kwargs):
     if get_admin_request_flag():
-        mongo_db["users"].update_one(
-            {"id": instance.id},
-            {"$set": {
-                "id": instance.id,
-                "username": instance.username,
-                "email": instance.email,
-                "is_staff": instance.is_staff,
-                "is_active": instance.is_active,
-                "profile_image": instance.profile_image.url if instance.profile_image else None,
-            }},
-            upsert=True
-        )
+        enqueue_mongo_sync("users", instance.id)
 
 @receiver(post_delete, sender=User)
 def delete_user_from_mongo(sender, instance, **kwargs):
     if get_admin_request_flag():
-        mongo_db["users"].delete_one({"id": instance.id})
+        enqueue_mongo_sync("users", instance.id)
@@ -0,0 +1,73 @@
+import copy
+import re
+
+from django.conf import settings
+from django.test import override_settings
+from django_redis import get_redis_connection
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from core import ratelimit, votes
+from core.authentication import VersionedRefreshToken
+from core.cache import reference_lru
+from core.models import Blog, Comment, User
+
+# Tests never touch the Redis database the app is configured with
+TEST_REDIS_DB = 15
+
+
+def scratch_caches():
+    caches = copy.deepcopy(settings.CACHES)
+    location = caches["default"]["LOCATION"]
+    caches["default"]["LOCATION"] = re.sub(r"(/\d+)?$", f"/{TEST_REDIS_DB}", location, count=1)
+    return caches
+
+
+class RedisTestMixin:
+    """Runs each test against an empty scratch Redis database."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._caches_override = override_settings(CACHES=scratch_caches())
+        cls._caches_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._caches_override.disable()
+
+    def setUp(self):
+        super().setUp()
+        get_redis_connection("default").flushdb()
+        # Lua scripts are registered on the client that was current when first used
+        votes._vote_script = None
+        ratelimit._script = None
+        reference_lru.data.clear()
+
+
+def mongo_available():
+    try:
+        MongoClient(settings.MONGO_URL, serverSelectionTimeoutMS=300).admin.command("ping")
+    except PyMongoError:
+        return False
+    return True
+
+
+def make_user(username="alice", **fields):
+    user = User(username=username, email=f"{username}@example.com", is_active=True, **fields)
+    user.set_password("password")
+    user.save()
+    return user
+
+
+def make_blog(author, title="Post", **fields):
+    return Blog.objects.create(title=title, description=f"<p>{title}</p>", author=author, **fields)
+
+
+def make_comment(blog, author, parent=None, content="Comment"):
+    return Comment.objects.create(blog=blog, author=author, parent=parent, content=content)
+
+
+def auth_header(user):
+    return {"HTTP_AUTHORIZATION": f"Bearer {VersionedRefreshToken.for_user(user).access_token}"}
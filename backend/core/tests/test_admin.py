@@ -0,0 +1,55 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from core.admin import bulk_delete
+from core.authentication import user_cache_key
+from core.models import Blog, Category, Comment, Menu, MongoOutbox, User
+from core.tests.helpers import RedisTestMixin, make_blog, make_comment, make_user
+
+
+def queued(collection):
+    return set(MongoOutbox.objects.filter(collection=collection).values_list("object_id", flat=True))
+
+
+class BulkDeleteTests(RedisTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = make_user()
+        self.reader = make_user("bob")
+        self.blog = make_blog(self.author)
+        self.other = make_blog(self.reader, title="Other")
+        self.root = make_comment(self.other, self.author)
+        reply = make_comment(self.other, self.reader, parent=self.root)
+        self.thread = [self.root, reply, make_comment(self.other, self.reader, parent=reply)]
+        self.on_blog = make_comment(self.blog, self.reader)
+        self.kept = make_comment(self.other, self.reader)
+        MongoOutbox.objects.all().delete()
+
+    def test_cascades_through_nested_replies_without_signals(self):
+        cache.set(user_cache_key(self.author.id, self.author.token_version), {"id": self.author.id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_delete(User, [self.author.id])
+
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertEqual(list(Blog.objects.values_list("id", flat=True)), [self.other.id])
+        self.assertEqual(list(Comment.objects.values_list("id", flat=True)), [self.kept.id])
+        self.assertEqual(queued("users"), {self.author.id})
+        self.assertEqual(queued("blogs"), {self.blog.id})
+        self.assertEqual(queued("comments"), {comment.id for comment in [*self.thread, self.on_blog]})
+        self.assertIsNone(cache.get(user_cache_key(self.author.id, self.author.token_version)))
+
+    def test_set_null_queues_the_rows_it_changes(self):
+        parent = Category.objects.create(title="Parent")
+        child = Category.objects.create(title="Child", parent=parent)
+        menu = Menu.objects.create(title="Menu", order=1, category=parent)
+        MongoOutbox.objects.all().delete()
+
+        bulk_delete(Category, [parent.id])
+
+        child.refresh_from_db()
+        menu.refresh_from_db()
+        self.assertIsNone(child.parent_id)
+        self.assertIsNone(menu.category_id)
+        self.assertEqual(queued("categories"), {parent.id, child.id})
+        self.assertEqual(queued("menus"), {menu.id})
@@ -0,0 +1,39 @@
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.test import TestCase
+
+from core.authentication import AUTH_USER_FIELDS, get_cached_user, user_cache_key
+from core.tests.helpers import RedisTestMixin, auth_header, make_user
+
+
+class CachedUserTests(RedisTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+
+    def test_caches_only_the_auth_fields_and_permissions(self):
+        self.user.user_permissions.add(Permission.objects.get(codename="view_api_docs"))
+        get_cached_user(self.user.pk, 0)
+
+        _, fields, permissions = cache.get(user_cache_key(self.user.pk, 0))
+        self.assertEqual(set(fields), set(AUTH_USER_FIELDS))
+        self.assertEqual(permissions, {"core.view_api_docs"})
+
+        with self.assertNumQueries(0):
+            user = get_cached_user(self.user.pk, 0)
+            self.assertEqual(user.username, "alice")
+            self.assertTrue(user.has_perm("core.view_api_docs"))
+
+    def test_changing_the_password_revokes_older_tokens(self):
+        old = auth_header(self.user)
+        self.assertEqual(self.client.get("/api/auth/profile", **old).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                "/api/auth/change-password", {"old_password": "password", "new_password": "n3w-pass"},
+                content_type="application/json", **old,
+            )
+        new = {"HTTP_AUTHORIZATION": f"Bearer {response.json()['access']}"}
+
+        self.assertEqual(self.client.get("/api/auth/profile", **old).status_code, 401)
+        self.assertEqual(self.client.get("/api/auth/profile", **new).json()["username"], "alice")
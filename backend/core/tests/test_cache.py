@@ -0,0 +1,71 @@
+import time
+
+from django.test import TestCase
+from django_redis import get_redis_connection
+
+from core.cache import bump_listing_generation, get_listing_generation
+from core.models import Blog, Tag
+from core.tests.helpers import RedisTestMixin, make_blog, make_user
+
+
+class ListingCacheTests(RedisTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.blog = make_blog(make_user(), title="Before")
+
+    def titles(self):
+        return [item["title"] for item in self.client.get("/api/blogs/").json()["items"]]
+
+    def test_serves_the_cached_page_until_a_write_bumps_the_generation(self):
+        self.assertEqual(self.titles(), ["Before"])
+
+        # A write that bypasses the receivers is not seen
+        Blog.objects.filter(pk=self.blog.pk).update(title="Hidden edit")
+        self.assertEqual(self.titles(), ["Before"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.blog.title = "After"
+            self.blog.save()
+        self.assertEqual(self.titles(), ["After"])
+
+    def test_query_parameter_order_does_not_matter(self):
+        self.client.get("/api/blogs/?page=1&q=")
+        Blog.objects.filter(pk=self.blog.pk).update(title="Hidden edit")
+        response = self.client.get("/api/blogs/", {"page": 1})
+        self.assertEqual(response.json()["items"][0]["title"], "Before")
+        self.assertEqual(response["Content-Type"], "application/json; charset=utf-8")
+
+    def test_generation_is_seeded_from_the_clock(self):
+        before = int(time.time() * 1000)
+        generation = get_listing_generation()
+        self.assertGreaterEqual(generation, before)
+
+        # A flushed Redis starts again from the clock, not from generations already handed out
+        get_redis_connection("default").flushdb()
+        self.assertGreaterEqual(bump_listing_generation(), before)
+
+
+class ReferenceCacheTests(RedisTestMixin, TestCase):
+    def test_etag_revalidation(self):
+        Tag.objects.create(title="django")
+        first = self.client.get("/api/tags/")
+        etag = first["ETag"]
+        self.assertEqual(first.json(), [{"id": Tag.objects.get().id, "title": "django"}])
+
+        revalidated = self.client.get("/api/tags/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated["ETag"], etag)
+        self.assertEqual(self.client.get("/api/tags/", HTTP_IF_NONE_MATCH=f'W/{etag}').status_code, 304)
+
+    def test_a_write_changes_the_etag(self):
+        tag = Tag.objects.create(title="django")
+        etag = self.client.get("/api/tags/")["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.title = "ninja"
+            tag.save()
+
+        response = self.client.get("/api/tags/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()[0]["title"], "ninja")
@@ -0,0 +1,90 @@
+from django.test import TestCase
+
+from core.comment_tree import decode_thread_cursor, encode_thread_cursor, fetch_comment_thread
+from core.tests.helpers import RedisTestMixin, make_blog, make_comment, make_user
+
+
+def ids(nodes):
+    return [node["id"] for node in nodes]
+
+
+class FetchCommentThreadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = make_user()
+        cls.blog = make_blog(cls.author)
+        other = make_blog(cls.author, title="Other")
+        make_comment(other, cls.author)
+        cls.roots = [make_comment(cls.blog, cls.author, content=f"root {i}") for i in range(3)]
+        cls.replies = [make_comment(cls.blog, cls.author, parent=cls.roots[0]) for _ in range(4)]
+        cls.grandchild = make_comment(cls.blog, cls.author, parent=cls.replies[0])
+        cls.great_grandchild = make_comment(cls.blog, cls.author, parent=cls.grandchild)
+
+    def test_nests_replies_under_their_parents(self):
+        roots, next_cursor = fetch_comment_thread(self.blog.id, depth=3, breadth=10)
+
+        self.assertIsNone(next_cursor)
+        self.assertEqual(ids(roots), [root.id for root in self.roots])
+        first = roots[0]
+        self.assertEqual(ids(first["replies"]), [reply.id for reply in self.replies])
+        self.assertEqual(ids(first["replies"][0]["replies"]), [self.grandchild.id])
+        self.assertEqual(first["author"], self.author.username)
+        self.assertEqual(roots[1]["replies"], [])
+
+    def test_pages_roots_with_a_cursor(self):
+        roots, next_cursor = fetch_comment_thread(self.blog.id, page_size=2)
+        self.assertEqual(ids(roots), [self.roots[0].id, self.roots[1].id])
+
+        parent_id, after_id = decode_thread_cursor(next_cursor)
+        roots, next_cursor = fetch_comment_thread(self.blog.id, parent_id, after_id, page_size=2)
+        self.assertEqual(ids(roots), [self.roots[2].id])
+        self.assertIsNone(next_cursor)
+
+    def test_caps_replies_per_parent(self):
+        roots, _ = fetch_comment_thread(self.blog.id, breadth=2)
+        first = roots[0]
+
+        self.assertEqual(ids(first["replies"]), [self.replies[0].id, self.replies[1].id])
+        parent_id, after_id = decode_thread_cursor(first["replies_cursor"])
+        self.assertEqual((parent_id, after_id), (self.roots[0].id, self.replies[1].id))
+
+        rest, _ = fetch_comment_thread(self.blog.id, parent_id, after_id, breadth=2)
+        self.assertEqual(ids(rest), [self.replies[2].id, self.replies[3].id])
+
+    def test_marks_comments_cut_off_by_depth(self):
+        roots, _ = fetch_comment_thread(self.blog.id, depth=2, breadth=10)
+        grandchild = roots[0]["replies"][0]["replies"][0]
+
+        self.assertEqual(grandchild["replies"], [])
+        self.assertEqual(decode_thread_cursor(grandchild["replies_cursor"]), (self.grandchild.id, 0))
+        # Leaves at the depth limit have nothing more to load
+        self.assertIsNone(roots[0]["replies"][1]["replies_cursor"])
+
+    def test_depth_zero_returns_roots_only(self):
+        roots, _ = fetch_comment_thread(self.blog.id, depth=0)
+
+        self.assertEqual(ids(roots), [root.id for root in self.roots])
+        self.assertTrue(all(root["replies"] == [] for root in roots))
+        self.assertIsNotNone(roots[0]["replies_cursor"])
+
+
+class CommentThreadEndpointTests(RedisTestMixin, TestCase):
+    def test_returns_the_thread(self):
+        author = make_user()
+        blog = make_blog(author)
+        root = make_comment(blog, author)
+        reply = make_comment(blog, author, parent=root)
+
+        response = self.client.get("/api/comments/tree", {"blog": blog.id})
+
+        self.assertEqual(response.status_code, 200)
+        items = response.json()["items"]
+        self.assertEqual(ids(items), [root.id])
+        self.assertEqual(ids(items[0]["replies"]), [reply.id])
+
+    def test_rejects_a_malformed_cursor(self):
+        response = self.client.get("/api/comments/tree", {"blog": 1, "cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_thread_cursor(encode_thread_cursor(None, 7)), (None, 7))
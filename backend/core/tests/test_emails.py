@@ -0,0 +1,54 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from core.emails import queue_email
+from core.management.commands.send_queued_emails import MAX_ATTEMPTS, requeue_dead_emails, send_batch
+from core.models import EmailDedupe, OutgoingEmail
+
+
+def queue(dedupe_key="reset:1"):
+    return queue_email("Reset", "link", ["a@example.com"], dedupe_key=dedupe_key)
+
+
+class QueueEmailTests(TestCase):
+    def test_repeats_inside_the_window_are_dropped(self):
+        self.assertTrue(queue())
+        self.assertFalse(queue())
+        self.assertTrue(queue("reset:2"))
+        self.assertEqual(OutgoingEmail.objects.count(), 2)
+
+    def test_a_rolled_back_request_does_not_hold_the_key(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            queue()
+            raise RuntimeError
+        self.assertTrue(queue())
+        self.assertEqual(OutgoingEmail.objects.count(), 1)
+
+    def test_an_expired_claim_is_reused(self):
+        queue()
+        EmailDedupe.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(queue())
+
+
+class SendBatchTests(TestCase):
+    def test_dead_letters_after_the_last_attempt(self):
+        queue(None)
+        OutgoingEmail.objects.update(attempts=MAX_ATTEMPTS - 1)
+        connection = mock.Mock(**{"open.side_effect": OSError})
+
+        with mock.patch("core.management.commands.send_queued_emails.get_connection", return_value=connection), \
+                self.assertLogs("core.management.commands.send_queued_emails", "ERROR"):
+            self.assertEqual(send_batch(10), (0, 1))
+
+        email = OutgoingEmail.objects.get()
+        self.assertIsNotNone(email.dead_at)
+        OutgoingEmail.objects.update(available_at=timezone.now())
+        self.assertEqual(send_batch(10), (0, 0))
+
+        self.assertEqual(requeue_dead_emails(), 1)
+        self.assertEqual(send_batch(10), (1, 0))
+        self.assertFalse(OutgoingEmail.objects.exists())
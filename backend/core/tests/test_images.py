@@ -0,0 +1,121 @@
+import base64
+import tempfile
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+
+from core.images import ImageRejected, avatar_dir, decode_data_uri, generate_avatars, validate_image
+from core.models import MongoOutbox
+from core.tests.helpers import RedisTestMixin, auth_header, make_user
+
+
+def png_bytes(size=(4, 4)):
+    buffer = BytesIO()
+    Image.new("RGB", size, "red").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def data_uri(payload, mime="image/png"):
+    return f"data:{mime};base64," + base64.b64encode(payload).decode()
+
+
+class DecodeDataUriTests(SimpleTestCase):
+    def test_decodes_in_chunks(self):
+        payload = bytes(range(256)) * 1024  # several DECODE_CHUNK slices
+        with decode_data_uri(data_uri(payload), max_bytes=len(payload)) as decoded:
+            self.assertEqual(decoded.read(), payload)
+
+    def test_rejects_oversized_payloads_before_decoding(self):
+        with self.assertRaisesMessage(ImageRejected, "too large"):
+            decode_data_uri(data_uri(b"x" * 2000), max_bytes=1000)
+
+    def test_rejects_non_image_and_malformed_uris(self):
+        for uri in ("data:text/plain;base64,aGk=", "image/png;base64,aGk=", "data:image/png;base64,@@@@"):
+            with self.subTest(uri=uri), self.assertRaises(ImageRejected):
+                decode_data_uri(uri, max_bytes=1000)
+
+
+class ValidateImageTests(SimpleTestCase):
+    def test_returns_the_extension_for_the_detected_format(self):
+        self.assertEqual(validate_image(BytesIO(png_bytes())), "png")
+
+    @override_settings(PROFILE_IMAGE_MAX_DIMENSION=10)
+    def test_rejects_oversized_dimensions(self):
+        with self.assertRaisesMessage(ImageRejected, "10x10"):
+            validate_image(BytesIO(png_bytes((11, 4))))
+
+    def test_rejects_content_that_is_not_an_image(self):
+        with self.assertRaises(ImageRejected):
+            validate_image(BytesIO(b"GIF89a but not really"))
+
+
+class ProfileImageUploadTests(RedisTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.user = make_user()
+
+    def upload(self, payload):
+        return self.client.post(
+            "/api/auth/profile/image", {"file": SimpleUploadedFile("a.png", payload)}, **auth_header(self.user)
+        )
+
+    def test_accepts_an_image_under_the_cap(self):
+        with self.captureOnCommitCallbacks():
+            response = self.upload(png_bytes())
+        self.assertEqual(response.json(), {"success": True})
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.profile_image.name.endswith(".png"))
+
+    @override_settings(PROFILE_IMAGE_MAX_BYTES=1000)
+    def test_rejects_oversized_uploads_before_spooling_them(self):
+        # From Content-Length, and from the bytes read when it leaves room for headers
+        for size in (50_000, 5_000):
+            with self.subTest(size=size):
+                self.assertEqual(self.upload(b"x" * size).status_code, 413)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.profile_image)
+
+
+class GenerateAvatarsTests(RedisTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, AVATAR_SIZES=(8, 16)))
+        self.user = make_user()
+
+    def set_image(self):
+        replaced = self.user.profile_image.name if self.user.profile_image else None
+        self.user.profile_image.save("profile.png", ContentFile(png_bytes((32, 32))))
+        return replaced
+
+    def test_stores_avatar_urls(self):
+        self.set_image()
+        generate_avatars(self.user.pk)
+
+        self.user.refresh_from_db()
+        self.assertEqual(set(self.user.avatars), {"8", "16"})
+        self.assertEqual(len(default_storage.listdir(avatar_dir(self.user.pk))[1]), 2)
+        self.assertTrue(MongoOutbox.objects.filter(collection="users", object_id=self.user.pk).exists())
+
+    def test_replacing_the_image_deletes_the_old_files(self):
+        self.set_image()
+        generate_avatars(self.user.pk)
+        first = self.user.profile_image.name
+
+        replaced = self.set_image()
+        generate_avatars(self.user.pk, replaced)
+
+        self.user.refresh_from_db()
+        self.assertEqual(replaced, first)
+        self.assertFalse(default_storage.exists(first))
+        files = default_storage.listdir(avatar_dir(self.user.pk))[1]
+        self.assertEqual(sorted(f"{avatar_dir(self.user.pk)}/{name}" for name in files),
+                         sorted(url.removeprefix("/media/") for url in self.user.avatars.values()))
@@ -0,0 +1,107 @@
+from unittest import mock, skipUnless
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from pymongo import DeleteMany, ReplaceOne
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+
+from core.management.commands import drain_mongo_outbox
+from core.management.commands.drain_mongo_outbox import MAX_ATTEMPTS, build_requests, drain_batch, requeue_dead_rows
+from core.management.commands.reconcile_mongo import checksum
+from core.models import MongoOutbox, Tag
+from core.mongo import get_mongo_db
+from core.tests.helpers import RedisTestMixin, mongo_available
+
+
+def failing_collection(error):
+    collection = mock.Mock()
+    collection.bulk_write.side_effect = error
+    return {"tags": collection}
+
+
+class BuildRequestsTests(TestCase):
+    def test_replaces_existing_rows_and_deletes_missing_ones(self):
+        tag = Tag.objects.create(title="django")
+
+        requests, request_ids = build_requests("tags", {tag.id, tag.id + 1000})
+
+        self.assertEqual(requests, [
+            ReplaceOne({"id": tag.id}, {"id": tag.id, "title": "django"}, upsert=True),
+            DeleteMany({"id": {"$in": [tag.id + 1000]}}),
+        ])
+        self.assertEqual(request_ids, [{tag.id}, {tag.id + 1000}])
+
+
+class DrainBatchTests(RedisTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.tags = [Tag.objects.create(title=f"tag {i}") for i in range(3)]
+        MongoOutbox.objects.all().delete()
+        for tag in self.tags:
+            MongoOutbox.objects.create(collection="tags", object_id=tag.id)
+        # Coalesced with the row above
+        MongoOutbox.objects.create(collection="tags", object_id=self.tags[0].id)
+
+    def drain(self, db):
+        with mock.patch.object(drain_mongo_outbox, "get_mongo_db", return_value=db):
+            return drain_batch(100)
+
+    def test_coalesces_and_clears_written_rows(self):
+        db = {"tags": mock.Mock()}
+
+        self.assertEqual(self.drain(db), (4, 0))
+
+        requests = db["tags"].bulk_write.call_args.args[0]
+        self.assertEqual(len(requests), 3)
+        self.assertFalse(MongoOutbox.objects.exists())
+
+    def test_only_rejected_writes_are_retried(self):
+        requests, request_ids = build_requests("tags", {tag.id for tag in self.tags})
+        rejected = request_ids.index({self.tags[1].id})
+        error = BulkWriteError({"writeErrors": [{"index": rejected, "errmsg": "bad"}], "writeConcernErrors": []})
+
+        with mock.patch.object(drain_mongo_outbox, "build_requests", return_value=(requests, request_ids)):
+            self.assertEqual(self.drain(failing_collection(error)), (4, 1))
+
+        row = MongoOutbox.objects.get()
+        self.assertEqual((row.object_id, row.attempts), (self.tags[1].id, 1))
+
+    def test_dead_letters_rows_that_keep_failing(self):
+        MongoOutbox.objects.update(attempts=MAX_ATTEMPTS - 1)
+
+        with self.assertLogs(drain_mongo_outbox.logger, "ERROR"):
+            self.drain(failing_collection(ServerSelectionTimeoutError("down")))
+
+        self.assertEqual(MongoOutbox.objects.filter(dead_at__isnull=False).count(), 4)
+        # Dead rows are skipped even once their backoff is over
+        MongoOutbox.objects.update(available_at=timezone.now())
+        self.assertEqual(self.drain({"tags": mock.Mock()}), (0, 0))
+
+        self.assertEqual(requeue_dead_rows(), 4)
+        self.assertEqual(self.drain({"tags": mock.Mock()}), (4, 0))
+
+
+class ChecksumTests(TestCase):
+    def test_ignores_key_order(self):
+        self.assertEqual(checksum([{"id": 1, "title": "a"}]), checksum([{"title": "a", "id": 1}]))
+        self.assertNotEqual(checksum([{"id": 1, "title": "a"}]), checksum([{"id": 1, "title": "a", "old": 1}]))
+
+
+@skipUnless(mongo_available(), "needs a MongoDB server at MONGO_URL")
+@override_settings(MONGO_DB_NAME="test_blog_sync")
+class ReconcileTests(TestCase):
+    def setUp(self):
+        self.db = get_mongo_db()
+        self.db["tags"].drop()
+
+    def test_rebuilds_and_repairs_drifted_documents(self):
+        kept = Tag.objects.create(title="kept")
+        self.db["tags"].insert_many([
+            {"id": kept.id, "title": "stale", "removed_field": True},
+            {"id": kept.id + 1000, "title": "orphan"},
+        ])
+
+        call_command("reconcile_mongo", "tags", "--verify", stdout=mock.Mock())
+
+        self.assertEqual(list(self.db["tags"].find({}, {"_id": 0})), [{"id": kept.id, "title": "kept"}])
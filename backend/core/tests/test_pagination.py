@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Blog
+from core.tests.helpers import RedisTestMixin, make_blog, make_user
+
+
+class BlogFeedTests(RedisTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = make_user()
+        now = timezone.now()
+        for i in range(7):
+            make_blog(author, title=f"Post {i}")
+        make_blog(author, title="Hidden", is_active=False)
+        # Two blogs share a timestamp so the id tie-breaker is exercised
+        blogs = list(Blog.objects.filter(is_active=True).order_by("id"))
+        for i, blog in enumerate(blogs):
+            blog.created_at = now - timedelta(minutes=i // 2)
+        Blog.objects.bulk_update(blogs, ["created_at"])
+        cls.newest_first = list(
+            Blog.objects.filter(is_active=True).order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+
+    def page(self, **params):
+        response = self.client.get("/api/blogs/feed", {"page_size": 3, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_walks_forward_and_back_without_gaps(self):
+        first = self.page()
+        self.assertIsNone(first["prev"])
+        second = self.page(cursor=first["next"])
+        third = self.page(cursor=second["next"])
+        self.assertIsNone(third["next"])
+
+        seen = [item["id"] for page in (first, second, third) for item in page["items"]]
+        self.assertEqual(seen, self.newest_first)
+
+        back = self.page(cursor=third["prev"])
+        self.assertEqual(back["items"], second["items"])
+        self.assertEqual(self.page(cursor=back["prev"])["items"], first["items"])
+
+    def test_clamps_page_size(self):
+        response = self.client.get("/api/blogs/feed", {"page_size": 1000})
+        self.assertEqual(len(response.json()["items"]), len(self.newest_first))
+
+    def test_rejects_a_malformed_cursor(self):
+        response = self.client.get("/api/blogs/feed", {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 400)
+
+
+class BlogListingTests(RedisTestMixin, TestCase):
+    def test_counts_and_pages_active_blogs(self):
+        author = make_user()
+        for i in range(12):
+            make_blog(author, title=f"Post {i}")
+        make_blog(author, title="Hidden", is_active=False)
+
+        first = self.client.get("/api/blogs/").json()
+        second = self.client.get("/api/blogs/", {"page": 2}).json()
+
+        self.assertEqual(first["count"], 12)
+        ids = [item["id"] for item in first["items"] + second["items"]]
+        self.assertEqual(sorted(ids), sorted(Blog.objects.filter(is_active=True).values_list("id", flat=True)))
+        self.assertEqual(first["items"][0]["category"], "")
+
+    def test_rejects_an_unknown_sort(self):
+        self.assertEqual(self.client.get("/api/blogs/", {"sort": "newest"}).status_code, 422)
@@ -0,0 +1,39 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from redis.exceptions import ConnectionError
+
+from core.ratelimit import parse_rate
+from core.tests.helpers import RedisTestMixin, make_user
+
+
+@override_settings(RATE_LIMITS={"login": {"ip": "100/m", "username": "2/m"}})
+class LoginRateLimitTests(RedisTestMixin, TestCase):
+    def login(self, username, ip="10.0.0.1"):
+        return self.client.post(
+            f"/api/auth/login?username={username}&password=wrong", REMOTE_ADDR=ip
+        )
+
+    def test_limits_by_username_across_addresses(self):
+        make_user()
+        self.assertEqual(self.login("alice", "10.0.0.1").status_code, 200)
+        self.assertEqual(self.login("ALICE", "10.0.0.2").status_code, 200)
+
+        response = self.login("alice", "10.0.0.3")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+
+        # Other accounts have their own bucket
+        self.assertEqual(self.login("bob").status_code, 200)
+
+    def test_fails_open_when_redis_is_down(self):
+        with mock.patch("core.ratelimit.get_script", side_effect=ConnectionError), \
+                self.assertLogs("core.ratelimit", "WARNING"):
+            for _ in range(5):
+                self.assertEqual(self.login("alice").status_code, 200)
+
+
+class ParseRateTests(TestCase):
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate("5/m"), (5, 60_000))
+        self.assertEqual(parse_rate("10/h"), (10, 3_600_000))
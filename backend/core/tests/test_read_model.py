@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+from unittest import skipUnless
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from ninja.errors import HttpError
+
+from core.models import Category, MongoOutbox, Tag
+from core.mongo import get_mongo_db
+from core.read_model import BlogDocuments, blog_query, ensure_indexes
+from core.schemas import BlogFilters
+from core.signals import MONGO_COLLECTIONS
+from core.tests.helpers import RedisTestMixin, auth_header, make_blog, make_user, mongo_available
+
+
+def outbox_blogs():
+    return set(MongoOutbox.objects.filter(collection="blogs").values_list("object_id", flat=True))
+
+
+class BlogQueryTests(TestCase):
+    def test_translates_filters(self):
+        filters = BlogFilters(author="Alice", category=3, include_descendants=True, tag=7)
+        self.assertEqual(blog_query(filters), {
+            "is_active": True, "author_key": "alice", "category_path": 3, "tag_ids": 7,
+        })
+        self.assertEqual(blog_query(BlogFilters(category=3))["category_id"], 3)
+
+    def test_date_bounds_cover_whole_days_in_the_current_time_zone(self):
+        query = blog_query(BlogFilters(date_from="2024-03-01", date_to="2024-03-02"))
+        start = timezone.make_aware(datetime(2024, 3, 1))
+        self.assertEqual(query["created_at"], {"$gte": start, "$lt": start + timedelta(days=2)})
+
+    def test_rejects_malformed_dates(self):
+        with self.assertRaises(HttpError):
+            blog_query(BlogFilters(date_from="03/01/2024"))
+
+
+class BlogDocumentTests(TestCase):
+    def test_embeds_what_the_listing_filters_on(self):
+        root = Category.objects.create(title="Root")
+        child = Category.objects.create(title="Child", parent=root)
+        author = make_user("Alice")
+        blog = make_blog(author, category=child)
+        blog.tags.set([Tag.objects.create(title="b"), Tag.objects.create(title="a")])
+
+        queryset, serialize = MONGO_COLLECTIONS["blogs"]
+        doc = serialize(queryset.get(pk=blog.pk))
+
+        self.assertEqual(doc["category"], "Child")
+        self.assertEqual(doc["category_path"], [root.id, child.id])
+        self.assertEqual(doc["tags"], ["b", "a"])
+        self.assertEqual(doc["author_key"], "alice")
+        self.assertEqual(doc["created_at"].microsecond % 1000, 0)
+
+    def test_uncategorized_blogs_have_an_empty_category(self):
+        blog = make_blog(make_user())
+        queryset, serialize = MONGO_COLLECTIONS["blogs"]
+        self.assertEqual(serialize(queryset.get(pk=blog.pk))["category"], "")
+
+
+class BlogOutboxTests(RedisTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = make_user()
+        self.blog = make_blog(self.author)
+        MongoOutbox.objects.all().delete()
+
+    def test_api_writes_enqueue_the_blog(self):
+        category = Category.objects.create(title="News")
+        response = self.client.put(f"/api/blogs/{self.blog.id}", {
+            "title": "Edited", "description": "<p>x</p>", "category_id": category.id, "tag_ids": [], "is_active": True,
+        }, content_type="application/json", **auth_header(self.author))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(outbox_blogs(), {self.blog.id})
+
+    @override_settings(BLOG_READ_MODEL="mongo")
+    def test_renaming_a_tag_enqueues_its_blogs(self):
+        tag = Tag.objects.create(title="old")
+        self.blog.tags.add(tag)
+        make_blog(self.author, title="Untagged")
+        MongoOutbox.objects.all().delete()
+
+        tag.title = "new"
+        with self.assertNumQueries(2):  # the UPDATE and one INSERT ... SELECT
+            tag.save()
+
+        self.assertEqual(outbox_blogs(), {self.blog.id})
+
+    @override_settings(BLOG_READ_MODEL="mongo")
+    def test_renaming_the_author_enqueues_their_blogs_without_rereading_the_user(self):
+        self.author.username = "alice2"
+        with self.assertNumQueries(2):  # the UPDATE and one INSERT ... SELECT
+            self.author.save(update_fields=["username"])
+        self.assertEqual(outbox_blogs(), {self.blog.id})
+
+        MongoOutbox.objects.all().delete()
+        self.author.first_name = "Alice"
+        self.author.save(update_fields=["first_name"])
+        self.assertEqual(outbox_blogs(), set())
+
+    def test_renames_do_not_fan_out_while_listings_read_postgres(self):
+        tag = Tag.objects.create(title="old")
+        self.blog.tags.add(tag)
+        MongoOutbox.objects.all().delete()
+
+        tag.title = "new"
+        tag.save()
+
+        self.assertEqual(outbox_blogs(), set())
+
+
+@skipUnless(mongo_available(), "needs a MongoDB server at MONGO_URL")
+@override_settings(MONGO_DB_NAME="test_blog_sync", BLOG_READ_MODEL="mongo")
+class MongoListingTests(RedisTestMixin, TestCase):
+    def test_matches_the_postgres_listing(self):
+        author = make_user()
+        tag = Tag.objects.create(title="t")
+        blogs = [make_blog(author, title=f"Post {i}") for i in range(3)]
+        blogs[0].tags.add(tag)
+        get_mongo_db()["blogs"].drop()
+        ensure_indexes("blogs")
+        queryset, serialize = MONGO_COLLECTIONS["blogs"]
+        get_mongo_db()["blogs"].insert_many([serialize(blog) for blog in queryset])
+
+        documents = BlogDocuments.matching(BlogFilters(tag=tag.id))
+        self.assertEqual(documents.count(), 1)
+        self.assertEqual([row[0] for row in documents[0:10]], [blogs[0].id])
+
+        mongo = self.client.get("/api/blogs/").json()
+        with override_settings(BLOG_READ_MODEL="postgres"):
+            postgres = self.client.get("/api/blogs/", {"_": "postgres"}).json()
+        self.assertEqual(mongo["count"], postgres["count"])
+        # Newest first; Mongo keeps created_at to the millisecond
+        self.assertEqual([item["id"] for item in mongo["items"]], [blog.id for blog in reversed(blogs)])
+        self.assertEqual(
+            {item["id"]: item["tags"] for item in mongo["items"]},
+            {item["id"]: item["tags"] for item in postgres["items"]},
+        )
@@ -0,0 +1,50 @@
+import os
+import tempfile
+import time
+from io import StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.tests.test_images import png_bytes
+from core.uploads import store_blob
+
+
+class GcUploadsTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+    def store(self):
+        return os.path.join(self.media_root, store_blob(SimpleUploadedFile("a.png", png_bytes())))
+
+    def age(self, path, hours):
+        past = time.time() - hours * 3600
+        os.utime(path, (past, past))
+
+    def gc(self):
+        call_command("gc_uploads", "--min-age", "1", stdout=StringIO())
+
+    def test_collects_old_unreferenced_blobs(self):
+        path = self.store()
+        self.age(path, 2)
+        self.gc()
+        self.assertFalse(os.path.exists(path))
+
+    def test_reusing_an_old_blob_keeps_it_from_being_collected(self):
+        path = self.store()
+        self.age(path, 2)
+        # A draft uploads the same image again, just before the collector runs
+        self.assertEqual(self.store(), path)
+        self.gc()
+        self.assertTrue(os.path.exists(path))
+
+    def test_reused_blob_leaves_no_temporary_file(self):
+        path = self.store()
+        self.store()
+        root = os.path.join(self.media_root, "uploads")
+        self.assertEqual([entry for entry in os.listdir(root) if entry.endswith(".part")], [])
+        self.assertTrue(os.path.exists(path))
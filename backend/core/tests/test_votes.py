@@ -0,0 +1,90 @@
+from django.test import TestCase
+from django_redis import get_redis_connection
+
+from core.models import Comment
+from core.tests.helpers import RedisTestMixin, auth_header, make_blog, make_comment, make_user
+from core.votes import (
+    CLEAR, DISLIKE, FLUSH_LOCK_KEY, FLUSHING_BATCH_KEY, FLUSHING_KEY, LIKE,
+    flush_votes, pending_vote_deltas, record_vote,
+)
+
+
+class VoteBufferTests(RedisTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = make_user()
+        self.comment = make_comment(make_blog(self.author), self.author)
+
+    def test_one_vote_per_user(self):
+        self.assertTrue(record_vote(self.comment.id, 1, LIKE))
+        self.assertFalse(record_vote(self.comment.id, 1, LIKE))
+        record_vote(self.comment.id, 2, LIKE)
+        self.assertEqual(pending_vote_deltas([self.comment.id]), {self.comment.id: (2, 0)})
+
+    def test_switching_and_clearing_votes(self):
+        record_vote(self.comment.id, 1, LIKE)
+        record_vote(self.comment.id, 1, DISLIKE)
+        self.assertEqual(pending_vote_deltas([self.comment.id]), {self.comment.id: (0, 1)})
+        record_vote(self.comment.id, 1, CLEAR)
+        self.assertEqual(pending_vote_deltas([self.comment.id]), {})
+
+    def test_flush_applies_deltas_once(self):
+        record_vote(self.comment.id, 1, LIKE)
+        record_vote(self.comment.id, 2, LIKE)
+        record_vote(self.comment.id, 3, DISLIKE)
+
+        self.assertEqual(flush_votes(), 1)
+        self.assertEqual(flush_votes(), 0)
+
+        self.comment.refresh_from_db()
+        self.assertEqual((self.comment.like, self.comment.dislike), (2, 1))
+        self.assertEqual(pending_vote_deltas([self.comment.id]), {})
+
+    def test_a_replayed_batch_is_not_applied_twice(self):
+        record_vote(self.comment.id, 1, LIKE)
+        redis = get_redis_connection("default")
+        redis.rename("votes:pending", FLUSHING_KEY)
+        redis.set(FLUSHING_BATCH_KEY, "batch-1")
+        saved = redis.hgetall(FLUSHING_KEY)
+
+        self.assertEqual(flush_votes(), 1)
+        # A crash right after the commit would have left the batch in Redis
+        redis.hset(FLUSHING_KEY, mapping=saved)
+        redis.set(FLUSHING_BATCH_KEY, "batch-1")
+        self.assertEqual(flush_votes(), 0)
+
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.like, 1)
+        self.assertFalse(redis.exists(FLUSHING_KEY, FLUSHING_BATCH_KEY))
+
+    def test_only_one_flusher_runs_at_a_time(self):
+        record_vote(self.comment.id, 1, LIKE)
+        held = get_redis_connection("default").lock(FLUSH_LOCK_KEY, timeout=10)
+        self.assertTrue(held.acquire(blocking=False))
+
+        self.assertEqual(flush_votes(), 0)
+        held.release()
+        self.assertEqual(flush_votes(), 1)
+
+    def test_flush_never_goes_below_zero(self):
+        Comment.objects.filter(pk=self.comment.pk).update(like=0)
+        record_vote(self.comment.id, 1, LIKE)
+        flush_votes()
+        # The user changes their mind after the like was flushed
+        record_vote(self.comment.id, 1, CLEAR)
+        Comment.objects.filter(pk=self.comment.pk).update(like=0)
+        flush_votes()
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.like, 0)
+
+    def test_listing_includes_unflushed_votes(self):
+        voter = make_user("bob")
+        response = self.client.post(
+            f"/api/comments/{self.comment.id}/vote", {"value": "like"},
+            content_type="application/json", **auth_header(voter),
+        )
+        self.assertEqual(response.json(), {"like": 1, "dislike": 0})
+
+        comments = self.client.get("/api/comments/", {"blog": self.comment.blog_id}).json()
+        self.assertEqual(comments[0]["like"], 1)
+        self.assertEqual(Comment.objects.get().like, 0)
@@ -9,3 +9,11 @@ def set_admin_request_flag(value: bool):
 
 def get_admin_request_flag() -> bool:
     return getattr(_local, "from_admin", False)
+
+
+def set_bulk_operation_flag(value: bool):
+    _local.bulk_operation = value
+
+
+def get_bulk_operation_flag() -> bool:
+    return getattr(_local, "bulk_operation", False)
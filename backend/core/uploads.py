@@ -0,0 +1,67 @@
+import contextlib
+import hashlib
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from PIL import Image, UnidentifiedImageError
+
+from core.images import ALLOWED_FORMATS
+
+UPLOADS_DIR = "uploads"
+
+# uploads/ab/cd/abcd...<64 hex>.<ext>
+BLOB_NAME_RE = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+BLOB_URL_RE = re.compile(r"uploads/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.[a-z0-9]+")
+
+
+def blob_name(digest, ext):
+    return f"{UPLOADS_DIR}/{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+
+def detect_extension(upload):
+    try:
+        with Image.open(upload) as image:
+            ext = ALLOWED_FORMATS.get(image.format)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        ext = None
+    upload.seek(0)
+    return ext
+
+
+def store_blob(upload):
+    """
+    Store an uploaded image under its SHA-256 and return the media-relative name.
+
+    Returns None for content that is not a supported image. The digest is
+    computed while the upload is copied, in a single pass. Identical content
+    maps to the same name, so an existing blob is kept and the copy dropped;
+    its mtime is refreshed so ``gc_uploads --min-age`` treats it as a new upload.
+    """
+    ext = detect_extension(upload)
+    if ext is None:
+        return None
+
+    root = os.path.join(settings.MEDIA_ROOT, UPLOADS_DIR)
+    os.makedirs(root, exist_ok=True)
+    # Written beside the shards (which gc_uploads never lists) and renamed once
+    # hashed, so readers never see a partial blob
+    fd, tmp_path = tempfile.mkstemp(dir=root, suffix=".part")
+    try:
+        digest = hashlib.sha256()
+        with os.fdopen(fd, "wb") as dest:
+            for chunk in upload.chunks():
+                digest.update(chunk)
+                dest.write(chunk)
+        name = blob_name(digest.hexdigest(), ext)
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+    return name
@@ -1,29 +1,30 @@
-import os
-from uuid import uuid4
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from django.views.decorators.csrf import csrf_exempt
+from core.metrics import metrics_registry, metrics_token_matches
+from core.uploads import store_blob
 
 
 def health_check(request):
     return JsonResponse({"status": "ok"})
 
 
+def metrics(request):
+    user = request.user
+    if not metrics_token_matches(request) and not (user.is_staff and user.has_perm("core.view_api_docs")):
+        return HttpResponseForbidden("You don't have permission to view the metrics.")
+    return HttpResponse(generate_latest(metrics_registry()), content_type=CONTENT_TYPE_LATEST)
+
+
 @csrf_exempt
 def tinymce_image_upload(request):
     if request.method == 'POST' and request.FILES.get('file'):
-        file = request.FILES['file']
-        ext = os.path.splitext(file.name)[-1]
-        filename = f"{uuid4().hex}{ext}"
-        filepath = os.path.join(settings.MEDIA_ROOT, 'uploads', filename)
-
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-
-        with open(filepath, 'wb+') as dest:
-            for chunk in file.chunks():
-                dest.write(chunk)
+        name = store_blob(request.FILES['file'])
+        if name is None:
+            return JsonResponse({'error': 'Unsupported image format'}, status=400)
 
-        file_url = f"{settings.MEDIA_URL}uploads/{filename}"
+        file_url = f"{settings.MEDIA_URL}{name}"
         return JsonResponse({'location': file_url})
 
     return JsonResponse({'error': 'Invalid request'}, status=400)
\ No newline at end of file
@@ -0,0 +1,145 @@
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import LockError
+
+from core.models import AppliedVoteBatch, Comment
+
+PENDING_KEY = "votes:pending"
+FLUSHING_KEY = "votes:flushing"
+FLUSHING_BATCH_KEY = "votes:flushing:batch"
+FLUSH_LOCK_KEY = "votes:flush_lock"
+FLUSH_LOCK_TIMEOUT = 60
+# Applied batch ids only need to outlive a crashed flush's retry
+BATCH_RETENTION = timedelta(days=1)
+
+LIKE = 1
+DISLIKE = -1
+CLEAR = 0
+
+# Swaps the user's vote and adjusts the pending like/dislike deltas atomically,
+# so concurrent votes never need a row lock in Postgres.
+VOTE_SCRIPT = """
+local old = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+local new = tonumber(ARGV[2])
+if old == new then
+    return 0
+end
+if new == 0 then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+else
+    redis.call('HSET', KEYS[1], ARGV[1], new)
+end
+if old == 1 then
+    redis.call('HINCRBY', KEYS[2], ARGV[3] .. ':like', -1)
+elseif old == -1 then
+    redis.call('HINCRBY', KEYS[2], ARGV[3] .. ':dislike', -1)
+end
+if new == 1 then
+    redis.call('HINCRBY', KEYS[2], ARGV[3] .. ':like', 1)
+elseif new == -1 then
+    redis.call('HINCRBY', KEYS[2], ARGV[3] .. ':dislike', 1)
+end
+return 1
+"""
+
+_vote_script = None
+
+
+def get_vote_script():
+    global _vote_script
+    if _vote_script is None:
+        _vote_script = get_redis_connection("default").register_script(VOTE_SCRIPT)
+    return _vote_script
+
+
+def record_vote(comment_id, user_id, value):
+    """Set the user's vote on a comment to LIKE, DISLIKE or CLEAR. Returns False if nothing changed."""
+    script = get_vote_script()
+    return bool(script(keys=[f"votes:comment:{comment_id}", PENDING_KEY], args=[user_id, value, comment_id]))
+
+
+def pending_vote_deltas(comment_ids):
+    """Return ``{comment_id: (like_delta, dislike_delta)}`` for votes not yet flushed to Postgres."""
+    comment_ids = list(comment_ids)
+    if not comment_ids:
+        return {}
+    fields = [f"{cid}:{kind}" for cid in comment_ids for kind in ("like", "dislike")]
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    pipe.hmget(PENDING_KEY, fields)
+    pipe.hmget(FLUSHING_KEY, fields)
+    pending, flushing = pipe.execute()
+
+    deltas = {}
+    for i, cid in enumerate(comment_ids):
+        like = int(pending[2 * i] or 0) + int(flushing[2 * i] or 0)
+        dislike = int(pending[2 * i + 1] or 0) + int(flushing[2 * i + 1] or 0)
+        if like or dislike:
+            deltas[cid] = (like, dislike)
+    return deltas
+
+
+def flush_votes():
+    """
+    Move the pending deltas to Postgres with one ``F()`` update per comment.
+
+    Pending deltas are renamed aside first, so votes arriving during the flush
+    go to a fresh hash. A batch left behind by a crashed flush is retried on
+    the next run before a new one is taken.
+
+    One flusher runs at a time (a Redis lock), and every batch carries an id
+    that is recorded with the counter updates: a batch whose transaction
+    committed is never applied twice, even if the lock expired mid-flush or
+    the process died before clearing the batch from Redis.
+    """
+    redis = get_redis_connection("default")
+    lock = redis.lock(FLUSH_LOCK_KEY, timeout=FLUSH_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        return 0
+    try:
+        return flush_batch(redis)
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            # Expired during a slow flush; the batch id already kept it single
+            pass
+
+
+def flush_batch(redis):
+    if not redis.exists(FLUSHING_KEY):
+        if not redis.exists(PENDING_KEY):
+            return 0
+        redis.rename(PENDING_KEY, FLUSHING_KEY)
+    redis.set(FLUSHING_BATCH_KEY, uuid.uuid4().hex, nx=True)
+    batch_id = redis.get(FLUSHING_BATCH_KEY).decode()
+
+    deltas = {}
+    for field, value in redis.hgetall(FLUSHING_KEY).items():
+        comment_id, kind = field.decode().split(":")
+        like, dislike = deltas.get(int(comment_id), (0, 0))
+        if kind == "like":
+            like += int(value)
+        else:
+            dislike += int(value)
+        deltas[int(comment_id)] = (like, dislike)
+
+    now = timezone.now()
+    with transaction.atomic():
+        _, created = AppliedVoteBatch.objects.get_or_create(batch_id=batch_id)
+        if created:
+            for comment_id, (like, dislike) in deltas.items():
+                if like or dislike:
+                    Comment.objects.filter(id=comment_id).update(
+                        like=Greatest(F("like") + like, 0),
+                        dislike=Greatest(F("dislike") + dislike, 0),
+                        updated_at=now,
+                    )
+            AppliedVoteBatch.objects.filter(applied_at__lt=now - BATCH_RETENTION).delete()
+    redis.delete(FLUSHING_KEY, FLUSHING_BATCH_KEY)
+    return len(deltas) if created else 0